@@ -0,0 +1,210 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from playwright.async_api import async_playwright
+
+from detail_extract import EXTRACT_JS, SELECTORS, build_review
+from detail_http import UA
+from readiness import WaitStats, await_detail_ready
+
+
+# 🔧 настройки по умолчанию
+DETAIL_WORKERS = 4
+READY_TIMEOUT_MS = 15_000   # потолок ожидания JSON-LD / тела отзыва
+
+# got — {"title", "text", "rating", "city", "date_raw"} или None, если страница упала
+OnResult = Callable[[Dict[str, Any], Optional[Dict[str, Optional[str]]]], None]
+
+
+class PagePool:
+    """
+    N заранее открытых вкладок, которые переиспользуются между отзывами
+    (вместо new_page()/close() на каждый отзыв).
+    """
+
+    def __init__(self, context: Any, size: int) -> None:
+        self.context = context
+        self.size = size
+        self._free: "asyncio.Queue[Any]" = asyncio.Queue()
+
+    async def start(self) -> None:
+        for _ in range(self.size):
+            self._free.put_nowait(await self.context.new_page())
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Any]:
+        page = await self._free.get()
+        if page is None:
+            # вкладок не осталось: метку возвращаем для остальных воркеров
+            self._free.put_nowait(None)
+            raise RuntimeError("в пуле не осталось вкладок")
+        broken = False
+        try:
+            yield page
+        except Exception:
+            broken = True
+            raise
+        finally:
+            if broken:
+                # после ошибки вкладка может зависнуть на полупереходе — меняем её на свежую
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+                page = await self._replacement()
+            if page is not None:
+                self._free.put_nowait(page)
+
+    async def _replacement(self) -> Optional[Any]:
+        # две попытки открыть вкладку взамен сломанной; иначе пул честно уменьшается
+        for attempt in (1, 2):
+            try:
+                return await self.context.new_page()
+            except Exception as e:
+                print(f"⚠️ Не удалось открыть новую вкладку (попытка {attempt}): {e}")
+        self.size -= 1
+        print(f"⚠️ Пул вкладок уменьшился до {self.size}")
+        if self.size == 0:
+            # будим ждущих воркеров, иначе они повиснут на пустой очереди
+            self._free.put_nowait(None)
+        return None
+
+    async def close(self) -> None:
+        while not self._free.empty():
+            page = self._free.get_nowait()
+            if page is None:
+                continue
+            try:
+                await page.close()
+            except Exception:
+                pass
+
+
+async def extract_review(page: Any, keep_newlines: bool = False) -> Dict[str, Optional[str]]:
+    """
+    Снимает поля с уже открытой страницы отзыва одним page.evaluate.
+    keep_newlines=True — текст с переносами строк (как в parser.py),
+    иначе все пробелы схлопываются (как в parser_texts.py / parser_all.py).
+    """
+    raw = await page.evaluate(EXTRACT_JS, SELECTORS)
+    return build_review(raw or {}, keep_newlines)
+
+
+async def crawl_details(
+    items: List[Dict[str, Any]],
+    on_result: OnResult,
+    workers: int = DETAIL_WORKERS,
+    pause_ms: int = 0,
+    keep_newlines: bool = False,
+    headless: bool = False,
+    stats: Optional[WaitStats] = None,
+    feed: Any = None,
+    limit: Optional[int] = None,
+    low_water: Optional[int] = None,
+    queue_size: int = 0,
+) -> None:
+    """
+    Обходит items (нужен ключ "link") пулом из workers вкладок.
+    on_result вызывается сразу по готовности каждой страницы — порядок вызовов
+    соответствует порядку завершения, а не порядку items.
+    Страница считается готовой по появлению JSON-LD / тела отзыва, а не по таймеру;
+    pause_ms — только вежливая пауза воркера между запросами (0 — без неё).
+
+    feed (например, listing_feed.ListingFeed) — источник новых ссылок в том же
+    браузере: следующая партия запрашивается, только когда в очереди осталось
+    не больше low_water ссылок (по умолчанию — по одной на вкладку), и не сверх limit.
+    queue_size > 0 ограничивает очередь: листинг ждёт, пока воркеры её разгребут.
+    """
+    if not items and feed is None:
+        return
+    stats = stats or WaitStats()
+
+    if feed is None:
+        workers = min(workers, len(items))
+    workers = max(1, workers)
+    low_water = workers if low_water is None else low_water
+    # вкладки (и листинг feed) ждут параллельно — отчёт делит суммы на их число
+    stats.workers = max(stats.workers, workers + (1 if feed is not None else 0))
+
+    queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=queue_size)
+    hungry = asyncio.Event()
+    queued = 0
+
+    async def put(item: Dict[str, Any]) -> None:
+        nonlocal queued
+        await queue.put(item)
+        queued += 1
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(
+            headless=headless,
+            args=["--no-sandbox", "--disable-setuid-sandbox"],
+        )
+        context = await browser.new_context(user_agent=UA, viewport=None)
+        pool = PagePool(context, workers)
+        await pool.start()
+
+        async def feeder() -> None:
+            try:
+                for item in items[:limit] if limit is not None else items:
+                    await put(item)
+                if feed is None:
+                    return
+                await feed.start(context)
+                if queue.qsize() <= low_water:
+                    hungry.set()
+                while limit is None or queued < limit:
+                    await hungry.wait()
+                    hungry.clear()
+                    if queue.qsize() > low_water:
+                        continue
+                    batch = await feed.next_batch(None if limit is None else limit - queued)
+                    if not batch:
+                        break
+                    for item in batch:
+                        await put(item)
+            except Exception as e:
+                print(f"⚠️ Листинг остановлен: {e}")
+            finally:
+                if feed is not None:
+                    await feed.close()
+                # по одной «пустышке» на воркер — сигнал, что новых ссылок не будет
+                for _ in range(workers):
+                    await queue.put(None)
+
+        async def worker() -> None:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                if queue.qsize() <= low_water:
+                    hungry.set()
+
+                got: Optional[Dict[str, Optional[str]]] = None
+                try:
+                    async with pool.page() as page:
+                        await page.goto(item["link"], wait_until="domcontentloaded", timeout=0)
+                        await await_detail_ready(page, READY_TIMEOUT_MS, stats)
+                        got = await extract_review(page, keep_newlines=keep_newlines)
+                except Exception as e:
+                    print(f"⚠️ Ошибка на {item.get('link')}: {e}")
+
+                try:
+                    on_result(item, got)
+                except Exception as e:
+                    # ошибка сохранения одного отзыва не должна останавливать воркер
+                    print(f"⚠️ Ошибка в on_result для {item.get('link')}: {e}")
+
+                await stats.asleep(pause_ms)
+
+        try:
+            await asyncio.gather(feeder(), *(worker() for _ in range(workers)))
+        finally:
+            await pool.close()
+            await browser.close()
+
+
+def run_details(items: List[Dict[str, Any]], on_result: OnResult, **kwargs: Any) -> None:
+    """Синхронная обёртка для скриптов: asyncio.run(crawl_details(...))."""
+    asyncio.run(crawl_details(items, on_result, **kwargs))
@@ -0,0 +1,153 @@
+import html
+import json
+import re
+from typing import Any, Dict, Optional
+
+
+# Версия набора селекторов: поднимать при любой правке SELECTORS / EXTRACT_JS
+EXTRACTOR_VERSION = 1
+
+# Все селекторы страницы отзыва в одном месте (используются и в браузере, и в HTTP-режиме)
+SELECTORS: Dict[str, Any] = {
+    "jsonLd": 'script[type="application/ld+json"]',
+    "textFallbacks": [
+        "[data-test='response-body']",
+        ".responses__text",
+        "article",
+        ".page-container__body [itemprop='reviewBody']",
+    ],
+    "title": "h1",
+    "grade": "[data-test='grade']",
+    "valueDivs": "div[value]",
+    "city": ".l3a372298",
+    "date": "time",
+    "dateAlt": ".l51115aff .l10fac986",
+}
+
+# Один page.evaluate на страницу: отдаёт «сырые» значения всех полей и фолбэков,
+# вся дальнейшая обработка — в build_review()
+EXTRACT_JS = """
+(sel) => {
+  const text = (q) => document.querySelector(q)?.textContent?.trim() || null;
+
+  let fallbackText = null;
+  for (const q of sel.textFallbacks) {
+    const el = document.querySelector(q);
+    if (el) { fallbackText = el.innerText; break; }
+  }
+
+  const divWithValue = Array.from(document.querySelectorAll(sel.valueDivs))
+    .find((d) => /^\\d$/.test(d.getAttribute("value") || ""));
+
+  return {
+    jsonLd: document.querySelector(sel.jsonLd)?.textContent || null,
+    fallbackText,
+    h1: text(sel.title),
+    grade: text(sel.grade),
+    divValue: divWithValue?.getAttribute("value") || null,
+    city: text(sel.city),
+    date: text(sel.date),
+    dateAlt: text(sel.dateAlt),
+  };
+}
+"""
+
+
+def strip_html(s: str) -> str:
+    # убираем теги + нормализуем пробелы
+    s = re.sub(r"<[^>]*>", "", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+
+def html_to_text(s: str, keep_newlines: bool = False) -> str:
+    """
+    HTML-фрагмент -> текст. HTML-сущности декодируются до снятия тегов
+    (как раньше textarea.innerHTML в браузере).
+    keep_newlines=True сохраняет абзацы, как div.innerText.
+    """
+    s = html.unescape(s)
+    if not keep_newlines:
+        return strip_html(s)
+
+    s = re.sub(r"<br\s*/?>", "\n", s, flags=re.I)
+    s = re.sub(r"</p\s*>", "\n\n", s, flags=re.I)
+    s = re.sub(r"<[^>]*>", "", s)
+    return normalize_text(s, keep_newlines=True)
+
+
+def normalize_text(s: str, keep_newlines: bool = False) -> str:
+    if not keep_newlines:
+        return re.sub(r"\s+", " ", s).strip()
+    lines = [re.sub(r"[^\S\n]+", " ", line).strip() for line in s.split("\n")]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def fields_from_json_ld(json_ld_text: str, keep_newlines: bool = False) -> Dict[str, Optional[str]]:
+    """JSON-LD отзыва -> {"title", "text", "rating"}."""
+    clean = re.sub(r"[\u0000-\u001F]+", " ", json_ld_text)
+    data = json.loads(clean)
+
+    author = data.get("author") if isinstance(data.get("author"), dict) else {}
+    review_body_html = (
+        data.get("reviewBody")
+        or author.get("reviewBody")
+        or author.get("description")
+        or data.get("description")
+        or None
+    )
+
+    full_text = html_to_text(review_body_html, keep_newlines) if isinstance(review_body_html, str) else None
+
+    rating = None
+    rr = data.get("reviewRating")
+    if rr is not None:
+        if isinstance(rr, dict):
+            rating = rr.get("ratingValue") or rr.get("value") or rr
+        else:
+            rating = rr
+
+    return {
+        "title": data.get("name") or None,
+        "text": full_text or None,
+        "rating": str(rating) if rating is not None else None,
+    }
+
+
+def build_review(raw: Dict[str, Optional[str]], keep_newlines: bool = False) -> Dict[str, Optional[str]]:
+    """
+    Сырые значения из EXTRACT_JS (или из HTML) -> {"title", "text", "rating", "city", "date_raw"}.
+    """
+    got: Dict[str, Optional[str]] = {"title": None, "text": None, "rating": None, "city": None, "date_raw": None}
+
+    # === JSON-LD ===
+    if raw.get("jsonLd"):
+        try:
+            got.update(fields_from_json_ld(raw["jsonLd"], keep_newlines))
+        except Exception as e:
+            print(f"⚠️ JSON-LD parse error: {e}")
+
+    # === Фолбэки ===
+    if not got["text"] and raw.get("fallbackText"):
+        got["text"] = normalize_text(raw["fallbackText"], keep_newlines) or None
+
+    if not got["title"]:
+        got["title"] = raw.get("h1") or None
+
+    if not got["rating"]:
+        grade = raw.get("grade")
+        if grade and re.fullmatch(r"\d", grade):
+            got["rating"] = grade
+        else:
+            got["rating"] = raw.get("divValue") or None
+
+    # === Город ===
+    city = raw.get("city")
+    if city:
+        city = re.sub(r"\s*\(.*?\)\s*$", "", city).strip()
+    got["city"] = city or None
+
+    # === Дата ===
+    got["date_raw"] = raw.get("date") or raw.get("dateAlt") or None
+
+    return got
@@ -0,0 +1,98 @@
+import re
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from lxml import html as lxml_html
+
+from detail_extract import SELECTORS, build_review
+
+
+# 🔧 настройки HTTP-клиента
+HTTP_TIMEOUT_S = 20
+HTTP_POOL_SIZE = 8
+HTTP_RETRIES = 2
+
+UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+      "AppleWebKit/537.36 (KHTML, like Gecko) "
+      "Chrome/127.0.0.0 Safari/537.36")
+
+
+def make_session(pool_size: int = HTTP_POOL_SIZE) -> requests.Session:
+    """
+    Одна сессия на весь прогон: keep-alive соединения переиспользуются
+    между запросами (и между потоками, до pool_size штук).
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=HTTP_RETRIES)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": UA,
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "ru-RU,ru;q=0.9,en;q=0.8",
+    })
+    return session
+
+
+def fetch_html(session: requests.Session, url: str) -> Optional[str]:
+    resp = session.get(url, timeout=HTTP_TIMEOUT_S)
+    if resp.status_code != 200:
+        return None
+    # без charset в заголовке requests считает страницу latin-1
+    if not resp.encoding or resp.encoding.lower() == "iso-8859-1":
+        resp.encoding = "utf-8"
+    return resp.text
+
+
+def _first_text(doc: Any, css: str) -> Optional[str]:
+    # как document.querySelector(...).textContent.trim() — только первый элемент
+    found = doc.cssselect(css)
+    return (found[0].text_content().strip() or None) if found else None
+
+
+def raw_from_html(page_html: str) -> Dict[str, Optional[str]]:
+    """
+    Те же «сырые» поля, что отдаёт EXTRACT_JS в браузере, но из серверного HTML.
+    """
+    doc = lxml_html.fromstring(page_html)
+
+    json_ld = doc.cssselect(SELECTORS["jsonLd"])
+    fallback_text = None
+    for css in SELECTORS["textFallbacks"]:
+        found = doc.cssselect(css)
+        if found:
+            fallback_text = found[0].text_content()
+            break
+
+    div_value = next(
+        (d.get("value") for d in doc.cssselect(SELECTORS["valueDivs"]) if re.fullmatch(r"\d", d.get("value") or "")),
+        None,
+    )
+
+    return {
+        "jsonLd": json_ld[0].text_content() if json_ld else None,
+        "fallbackText": fallback_text,
+        "h1": _first_text(doc, SELECTORS["title"]),
+        "grade": _first_text(doc, SELECTORS["grade"]),
+        "divValue": div_value,
+        "city": _first_text(doc, SELECTORS["city"]),
+        "date": _first_text(doc, SELECTORS["date"]),
+        "dateAlt": _first_text(doc, SELECTORS["dateAlt"]),
+    }
+
+
+def parse_detail_html(page_html: str, keep_newlines: bool = False) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Разбор серверного HTML страницы отзыва.
+    Возвращает {"title", "text", "rating", "city", "date_raw"} или None,
+    если JSON-LD в HTML нет (страницу нужно открыть в браузере).
+    """
+    raw = raw_from_html(page_html)
+    if not raw["jsonLd"]:
+        return None
+
+    got = build_review(raw, keep_newlines)
+    if not got["text"]:
+        return None
+    return got
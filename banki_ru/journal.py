@@ -0,0 +1,93 @@
+import json
+import os
+from typing import Any, Dict, List
+
+
+class Journal:
+    """
+    Append-only JSONL: одна запись — одна строка, файл только дописывается.
+    fsync делается пачками (каждые fsync_every записей или по sync()),
+    так что стоимость сохранения не растёт с размером файла.
+    """
+
+    def __init__(self, path: str, fsync_every: int = 200) -> None:
+        self.path = path
+        self.fsync_every = fsync_every
+        self.pending = 0
+        _drop_torn_tail(path)
+        self.f = open(path, "a", encoding="utf-8")
+
+    def append(self, item: Dict[str, Any]) -> None:
+        self.f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self.pending += 1
+        if self.pending >= self.fsync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.pending = 0
+
+    def close(self) -> None:
+        if not self.f.closed:
+            self.sync()
+            self.f.close()
+
+
+def _drop_torn_tail(path: str) -> None:
+    # если процесс упал посреди записи — отрезаем недописанную последнюю строку,
+    # иначе следующая запись приклеится к ней
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        pos = size - 1
+        while pos > 0:
+            step = min(64 * 1024, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            nl = chunk.rfind(b"\n")
+            if nl != -1:
+                f.truncate(pos - step + nl + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+
+def replay(path: str) -> List[Dict[str, Any]]:
+    """Читает журнал построчно; битые строки пропускаются."""
+    items: List[Dict[str, Any]] = []
+    if not os.path.exists(path):
+        return items
+
+    bad = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except Exception:
+                bad += 1
+                continue
+            if isinstance(item, dict):
+                items.append(item)
+
+    if bad:
+        print(f"⚠️ Журнал {path}: пропущено битых строк {bad}")
+    return items
+
+
+def compact(items: List[Dict[str, Any]], out_path: str) -> None:
+    """Итоговый JSON-массив из журнала (атомарная замена файла)."""
+    tmp = out_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(items, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, out_path)
@@ -0,0 +1,127 @@
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from listing_harvest import CARD_SELECTOR, INSTALL_JS, aharvest_new_cards
+from readiness import WaitStats, await_harvest
+
+
+MORE_BTN_SELECTOR = "[data-test='responses__more-btn']"
+FIRST_CARDS_TIMEOUT_MS = 60_000
+MORE_CARDS_TIMEOUT_MS = 15_000
+MAX_EMPTY_CLICKS = 3   # столько кликов подряд без новых карточек — листинг кончился
+OLD_BATCH_STREAK_TO_STOP = 3   # столько партий подряд старше date_from — дальше только старое
+
+
+def _date_iso(s: Optional[str]) -> Optional[str]:
+    m = re.search(r"(\d{2})\.(\d{2})\.(\d{4})", s or "")
+    return f"{m.group(3)}-{m.group(2)}-{m.group(1)}" if m else None
+
+
+class ListingFeed:
+    """
+    Листинг «Показать ещё» как источник ссылок для crawl_details:
+    следующая партия карточек подгружается, только когда очередь воркеров
+    почти пуста, а не заранее на весь лимит.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        accept: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        stats: Optional[WaitStats] = None,
+        max_clicks: int = 1000,
+        date_from: Optional[str] = None,
+        on_emit: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> None:
+        self.url = url
+        self.accept = accept or (lambda item: True)
+        self.stats = stats or WaitStats()
+        self.max_clicks = max_clicks
+        self.date_from = date_from   # "YYYY-MM-DD": листинг идёт от новых к старым — ниже можно не листать
+        self.on_emit = on_emit       # вызывается до того, как партия уйдёт воркерам (журнал и т.п.)
+        self.old_streak = 0
+        self.page: Any = None
+        self.pending: List[Dict[str, Any]] = []
+        self.items: List[Dict[str, Any]] = []   # всё, что отдано воркерам, в порядке листинга
+        self.clicks = 0
+        self.exhausted = False
+        self.ended = False   # листинг действительно кончился (даты старше date_from / нет кнопки), а не упёрся в лимит
+
+    async def start(self, context: Any) -> None:
+        self.page = await context.new_page()
+        print("🌐 Открываю листинг:", self.url)
+        await self.page.goto(self.url, wait_until="domcontentloaded", timeout=0)
+        await self.page.wait_for_selector(CARD_SELECTOR, timeout=FIRST_CARDS_TIMEOUT_MS)
+        await self.page.evaluate(INSTALL_JS, CARD_SELECTOR)
+
+    async def _drain(self) -> None:
+        cards, _ = await aharvest_new_cards(self.page)
+        if self.date_from and cards:
+            dates = [_date_iso(c.get("dateRaw")) for c in cards]
+            if all(d and d < self.date_from for d in dates):
+                self.old_streak += 1
+                if self.old_streak >= OLD_BATCH_STREAK_TO_STOP:
+                    print("🛑 Дальше в листинге только старые даты — стоп.")
+                    self.exhausted = True
+                    self.ended = True
+            else:
+                self.old_streak = 0
+        for c in cards:
+            if not c.get("id") or not c.get("link"):
+                continue
+            item = {
+                "id": c["id"],
+                "link": c["link"],
+                "date": _date_iso(c.get("dateRaw")),
+                "title": c.get("title") or None,
+                "text": None,
+                "rating": c.get("rating") or None,
+                "teaser": c.get("teaser") or None,
+            }
+            if self.accept(item):
+                self.pending.append(item)
+
+    async def _click_more(self) -> bool:
+        btn = await self.page.query_selector(MORE_BTN_SELECTOR)
+        if not btn:
+            print("ℹ️ Кнопка 'Показать ещё' не найдена — листинг кончился.")
+            return False
+        self.clicks += 1
+        print(f"👉 [{self.clicks}] Кликаю 'Показать ещё'...")
+        await btn.click()
+        await self.page.evaluate("() => window.scrollTo({ top: document.body.scrollHeight, behavior: 'instant' })")
+        return await await_harvest(self.page, MORE_BTN_SELECTOR, MORE_CARDS_TIMEOUT_MS, self.stats)
+
+    async def next_batch(self, max_items: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Следующая партия (не больше max_items); [] — листинг исчерпан."""
+        empty_clicks = 0
+        while not self.pending and not self.exhausted:
+            await self._drain()
+            if self.pending:
+                break
+            if self.clicks >= self.max_clicks:
+                print("⚠️ Достигнут лимит нажатий 'Показать ещё'.")
+                self.exhausted = True
+            elif await self._click_more():
+                empty_clicks = 0
+            else:
+                empty_clicks += 1
+                if not await self.page.query_selector(MORE_BTN_SELECTOR):
+                    self.exhausted = True
+                    self.ended = True
+                elif empty_clicks >= MAX_EMPTY_CLICKS:
+                    self.exhausted = True
+
+        n = len(self.pending) if max_items is None else max(0, max_items)
+        batch, self.pending = self.pending[:n], self.pending[n:]
+        if batch and self.on_emit is not None:
+            self.on_emit(batch)
+        self.items.extend(batch)
+        return batch
+
+    async def close(self) -> None:
+        if self.page is not None:
+            try:
+                await self.page.close()
+            except Exception:
+                pass
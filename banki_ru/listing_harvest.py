@@ -0,0 +1,120 @@
+from typing import Any, Dict, List, Tuple
+
+
+CARD_SELECTOR = "[data-test='responses__response']"
+
+# Ставит в страницу MutationObserver, который складывает в буфер только
+# добавленные карточки. Уже загруженные карточки кладутся в буфер сразу.
+INSTALL_JS = """
+(sel) => {
+  if (window.__harvest) return true;
+
+  const read = (n) => {
+    const a = n.querySelector("h3 a, [data-test='link-text']");
+    const href = a?.getAttribute("href") || "";
+    const link = href ? (href.startsWith("http") ? href : `https://www.banki.ru${href}`) : null;
+    const idMatch = link?.match(/response\\/(\\d+)/);
+    const id = idMatch ? Number(idMatch[1]) : null;
+    const title =
+      n.querySelector("h3")?.textContent?.trim() ||
+      n.querySelector("[data-test='link-text']")?.textContent?.trim() ||
+      null;
+    const dateRaw =
+      n.querySelector(".Responsesstyled__StyledItemSmallText-sc-150koqm-4")?.textContent?.trim() ||
+      n.textContent.match(/\\d{2}\\.\\d{2}\\.\\d{4}/)?.[0] ||
+      null;
+    const rating = n.getAttribute("data-test-grade") || null;
+    const teaser = n.querySelector(".Responsesstyled__StyledItemText-sc-150koqm-3 a")
+      ?.textContent?.trim() || null;
+    return { id, link, title, dateRaw, rating, teaser };
+  };
+
+  const h = { buffer: [], seen: new Set(), total: 0, read, harvested: [] };
+
+  const observer = new MutationObserver((mutations) => {
+    for (const m of mutations) {
+      for (const node of m.addedNodes) {
+        if (node.nodeType !== 1) continue;
+        if (node.matches(sel)) h.buffer.push(node);
+        else node.querySelectorAll(sel).forEach((n) => h.buffer.push(n));
+      }
+    }
+  });
+  observer.observe(document.body, { childList: true, subtree: true });
+
+  document.querySelectorAll(sel).forEach((n) => h.buffer.push(n));
+  window.__harvest = h;
+  return true;
+}
+"""
+
+# Забирает из буфера только новые карточки: стоимость зависит от размера
+# подгруженной партии, а не от числа карточек в DOM.
+DRAIN_JS = """
+() => {
+  const h = window.__harvest;
+  if (!h) return null;
+
+  const nodes = h.buffer.splice(0);
+  const cards = [];
+  for (const n of nodes) {
+    const card = h.read(n);
+    if (!card.id) {
+      // карточка могла ещё не дорендериться — дадим ей пару шансов
+      n.__harvestTries = (n.__harvestTries || 0) + 1;
+      if (n.__harvestTries < 3 && n.isConnected) h.buffer.push(n);
+      continue;
+    }
+    if (h.seen.has(card.id)) continue;
+    h.seen.add(card.id);
+    h.harvested.push(n);
+    cards.push(card);
+  }
+  h.total += cards.length;
+  return { cards, total: h.total };
+}
+"""
+
+# Прячет уже снятые карточки, кроме последних keep (сентинел для подгрузки).
+# Узлы принадлежат React: их дети не трогаются (иначе следующая подгрузка может
+# упасть на reconcile), карточка только выпадает из раскладки и отрисовки —
+# стиль/лейаут/пейнт перестают расти вместе с числом кликов.
+PRUNE_JS = """
+(keep) => {
+  const h = window.__harvest;
+  if (!h) return 0;
+  const cut = Math.max(0, h.harvested.length - keep);
+  const old = h.harvested.splice(0, cut);
+  for (const n of old) {
+    n.style.display = "none";
+    n.setAttribute("data-harvest-pruned", "1");
+  }
+  return old.length;
+}
+"""
+
+
+def harvest_new_cards(page: Any) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Новые карточки с прошлого вызова + общее число уникальных карточек.
+    Если страница перезагрузилась, наблюдатель ставится заново.
+    """
+    res = page.evaluate(DRAIN_JS)
+    if res is None:
+        page.evaluate(INSTALL_JS, CARD_SELECTOR)
+        res = page.evaluate(DRAIN_JS)
+    return (res or {}).get("cards") or [], (res or {}).get("total") or 0
+
+
+def prune_harvested(page: Any, keep: int = 1) -> int:
+    """Прячет уже снятые карточки (display:none); возвращает, сколько спрятано."""
+    return page.evaluate(PRUNE_JS, keep) or 0
+
+
+async def aharvest_new_cards(page: Any) -> Tuple[List[Dict[str, Any]], int]:
+    """То же для async-страницы Playwright."""
+    res = await page.evaluate(DRAIN_JS)
+    if res is None:
+        await page.evaluate(INSTALL_JS, CARD_SELECTOR)
+        res = await page.evaluate(DRAIN_JS)
+    return (res or {}).get("cards") or [], (res or {}).get("total") or 0
@@ -0,0 +1,159 @@
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from lxml import html as lxml_html
+
+from detail_http import fetch_html
+from listing_harvest import CARD_SELECTOR
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from page_search import gallop_first
+
+
+LISTING_URL = "https://www.banki.ru/services/responses/bank/gazprombank/?is_countable=on"
+LISTING_WORKERS = 4
+MAX_PAGE = 100_000   # предохранитель для галопа
+FETCH_ATTEMPTS = 4       # попыток на страницу (429/503/сеть), паузы растут вдвое
+FETCH_BACKOFF_S = 2.0
+
+DATE_CLASS = "Responsesstyled__StyledItemSmallText-sc-150koqm-4"
+
+
+class ListingFetchError(RuntimeError):
+    """Страница листинга не скачалась за FETCH_ATTEMPTS попыток."""
+
+
+def page_url(page_num: int, base_url: str = LISTING_URL) -> str:
+    if page_num <= 1:
+        return base_url
+    sep = "&" if "?" in base_url else "?"
+    return f"{base_url}{sep}page={page_num}"
+
+
+def _date_iso(s: Optional[str]) -> Optional[str]:
+    if not s:
+        return None
+    m = re.search(r"(\d{2})\.(\d{2})\.(\d{4})", s)
+    if not m:
+        return None
+    return f"{m.group(3)}-{m.group(2)}-{m.group(1)}"
+
+
+def parse_listing_html(page_html: str) -> List[Dict[str, Any]]:
+    """
+    Карточки листинга из серверного HTML: [{"id", "link", "title", "date"}].
+    Те же поля, что снимает listing_harvest в браузере.
+    """
+    doc = lxml_html.fromstring(page_html)
+    cards: List[Dict[str, Any]] = []
+
+    for n in doc.cssselect(CARD_SELECTOR):
+        a = n.cssselect("h3 a, [data-test='link-text']")
+        href = a[0].get("href") if a else ""
+        link = (href if href.startswith("http") else f"https://www.banki.ru{href}") if href else None
+        m = re.search(r"response/(\d+)", link or "")
+        if not m:
+            continue
+
+        h3 = n.cssselect("h3")
+        title = (h3[0].text_content().strip() if h3 else "") or (a[0].text_content().strip() if a else "")
+
+        date_el = n.cssselect(f".{DATE_CLASS}")
+        date_raw = date_el[0].text_content() if date_el else n.text_content()
+
+        cards.append({
+            "id": int(m.group(1)),
+            "link": link,
+            "title": title or None,
+            "date": _date_iso(date_raw),
+        })
+
+    return cards
+
+
+class ListingPages:
+    """
+    Листинг banki.ru по номерам страниц (?page=N) через HTTP.
+    Каждая страница качается не больше одного раза за прогон.
+    """
+
+    def __init__(self, session: Any, base_url: str = LISTING_URL) -> None:
+        self.session = session
+        self.base_url = base_url
+        self.cache: Dict[int, List[Dict[str, Any]]] = {}
+        self.fetched = 0
+
+    def _fetch(self, page_num: int) -> List[Dict[str, Any]]:
+        """
+        Карточки страницы. [] — только настоящий ответ 200 без карточек (конец листинга);
+        ошибка загрузки после всех попыток — ListingFetchError, а не «пустая страница».
+        """
+        url = page_url(page_num, self.base_url)
+        error = "не 200"
+        for attempt in range(FETCH_ATTEMPTS):
+            if attempt:
+                pause = FETCH_BACKOFF_S * 2 ** (attempt - 1)
+                print(f"⏳ Страница {page_num}: {error}, повтор через {pause:.0f} с")
+                time.sleep(pause)
+            try:
+                page_html = fetch_html(self.session, url)
+            except Exception as e:
+                error = str(e)
+                continue
+            if page_html is not None:
+                return parse_listing_html(page_html)
+            error = "не 200"
+        raise ListingFetchError(f"страница {page_num} листинга не загрузилась: {error}")
+
+    def cards(self, page_num: int) -> List[Dict[str, Any]]:
+        if page_num not in self.cache:
+            self.cache[page_num] = self._fetch(page_num)
+            self.fetched += 1
+        return self.cache[page_num]
+
+    def dates(self, page_num: int) -> Tuple[Optional[date], Optional[date]]:
+        """(самая новая, самая старая) дата на странице."""
+        ds = [datetime.strptime(c["date"], "%Y-%m-%d").date() for c in self.cards(page_num) if c.get("date")]
+        if not ds:
+            return None, None
+        return max(ds), min(ds)
+
+    def find_window(self, date_from: date, date_to: date) -> Optional[Tuple[int, int]]:
+        """
+        Первая и последняя страницы, пересекающиеся с [date_from, date_to].
+        Листинг отсортирован от новых к старым, поэтому оба края — монотонные предикаты.
+        Незагрузившаяся страница — ListingFetchError, окно по ней не двигается.
+        """
+        def reached_window(p: int) -> bool:
+            # страница уже не новее date_to (или листинг кончился)
+            newest, oldest = self.dates(p)
+            return oldest is None or oldest <= date_to
+
+        def past_window(p: int) -> bool:
+            # страница целиком старше date_from (или листинг кончился)
+            newest, oldest = self.dates(p)
+            return newest is None or newest < date_from
+
+        first = gallop_first(reached_window, max_page=MAX_PAGE)
+        if past_window(first):
+            return None
+        last = gallop_first(past_window, start=first, max_page=MAX_PAGE) - 1
+        return first, last
+
+    def fetch_range(self, first: int, last: int, workers: int = LISTING_WORKERS) -> List[Dict[str, Any]]:
+        """Качает страницы first..last параллельно, карточки — в порядке страниц."""
+        todo = [p for p in range(first, last + 1) if p not in self.cache]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for p, cards in zip(todo, pool.map(self._fetch, todo)):
+                self.cache[p] = cards
+                self.fetched += 1
+
+        out: List[Dict[str, Any]] = []
+        for p in range(first, last + 1):
+            out.extend(self.cache[p])
+        return out
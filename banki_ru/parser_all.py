@@ -1,12 +1,18 @@
 import json
 import os
 import re
-import time
+import sys
 import signal
 from datetime import datetime, date
 from typing import Any, Dict, List, Optional
 
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from async_detail import run_details
+from journal import Journal, replay
+from listing_feed import ListingFeed
+from readiness import WaitStats
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from review_store import ReviewStore
 
 
 START_URL = "https://www.banki.ru/services/responses/bank/gazprombank/?is_countable=on"
@@ -18,18 +24,14 @@ DATE_TO   = date(2026, 2, 8)
 MAX_REVIEWS = 5000            # общий лимит (карточки/ссылки)
 CLICK_MORE_TRIES = 1000       # максимум кликов "Показать ещё"
 SAVE_EVERY = 50               # автосейв каждые N отзывов
-PAGE_TIMEOUT_MS = 60_000
+DETAIL_WORKERS = 4            # вкладок в пуле для глубокого парсинга
+PIPELINE_QUEUE = 50           # жёсткий потолок очереди: листинг не опережает воркеров больше чем на столько ссылок
+POLITENESS_PAUSE_MS = 0       # вежливая пауза вкладки между отзывами, мс (0 — без неё)
 
 CHECKPOINT_FILE = "checkpoint.json"
+LISTING_JOURNAL_FILE = "listing.journal.jsonl"   # карточки листинга, append-only
 OUTPUT_FILE = "reviews_full.json"
-
-UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-      "AppleWebKit/537.36 (KHTML, like Gecko) "
-      "Chrome/127.0.0.0 Safari/537.36")
-
-
-def delay_ms(ms: int) -> None:
-    time.sleep(ms / 1000.0)
+SOURCE = "banki_ru"   # ключ источника в общей базе review_store
 
 
 def parse_date_iso_ddmmyyyy(s: Optional[str]) -> Optional[str]:
@@ -84,16 +86,41 @@ def main() -> None:
         results = []
 
     done_ids = set(x.get("id") for x in results if isinstance(x, dict) and x.get("id") is not None)
+    # отзывы, оказавшиеся вне диапазона уже по дате со страницы — повторно не открываем
+    skipped_ids = set(checkpoint.get("skipped") or [])
+    # листинг уже пролистан до конца (по дате или до пропажи «Показать ещё»)
+    listing_ended = bool(checkpoint.get("listing_ended"))
+    feed: Optional[ListingFeed] = None
 
     processed_total = len(results)
     added_total = len(results)
 
+    # листинг — append-only журнал; карточка попадает в него раньше, чем в очередь
+    # воркеров, так что после падения ни одна собранная ссылка не теряется
+    listing: List[Dict[str, Any]] = replay(LISTING_JOURNAL_FILE)
+    journal = Journal(LISTING_JOURNAL_FILE, fsync_every=SAVE_EVERY)
+    if not listing and isinstance(checkpoint.get("listing"), list):
+        # листинг из чекпоинта прошлой версии — переносим в журнал один раз
+        for x in checkpoint["listing"]:
+            if isinstance(x, dict) and x.get("id"):
+                listing.append(x)
+                journal.append(x)
+        journal.sync()
+    listed_ids = set(x.get("id") for x in listing)
+
+    def checkpoint_data() -> Dict[str, Any]:
+        # хвост, не отданный воркерам, в журнал не попал — такой листинг законченным не считаем
+        ended = listing_ended or bool(feed is not None and feed.ended and not feed.pending)
+        return {"done": results, "skipped": sorted(skipped_ids), "listing_ended": ended}
+
     def save_checkpoint(reason: str) -> None:
-        write_json_atomic(CHECKPOINT_FILE, {"done": results})
+        journal.sync()
+        write_json_atomic(CHECKPOINT_FILE, checkpoint_data())
         print(f"💾 Сохранено ({reason}): {len(results)} отзывов")
 
     def save_final() -> None:
-        write_json_atomic(CHECKPOINT_FILE, {"done": results})
+        journal.sync()
+        write_json_atomic(CHECKPOINT_FILE, checkpoint_data())
         write_json_atomic(OUTPUT_FILE, results)
 
     def handle_sigint(signum, frame):
@@ -103,245 +130,113 @@ def main() -> None:
 
     signal.signal(signal.SIGINT, handle_sigint)
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=False,
-            args=["--no-sandbox", "--disable-setuid-sandbox"],
+    if results:
+        print(f"🔄 Загружен чекпоинт, уже собрано: {len(results)}")
+
+    # сначала — недоделанное из журнала, потом листинг продолжает подгружаться
+    todo = [
+        r for r in listing
+        if r.get("id") not in done_ids and r.get("id") not in skipped_ids and in_range(r.get("date"))
+    ]
+    if listing:
+        print(f"⏩ Листинг из журнала: {len(listing)} карточек, осталось {len(todo)}")
+
+    # фильтр по датам — по дате с листинга, до открытия страниц;
+    # дата со страницы отзыва потом только подтверждает
+    out_of_window = 0
+
+    def accept(item: Dict[str, Any]) -> bool:
+        nonlocal out_of_window
+        if item["id"] in listed_ids:
+            return False
+        if not in_range(item.get("date")):
+            out_of_window += 1
+            return False
+        return True
+
+    def on_emit(batch: List[Dict[str, Any]]) -> None:
+        for item in batch:
+            listed_ids.add(item["id"])
+            journal.append({k: item.get(k) for k in ("id", "link", "title", "date")})
+        journal.sync()
+
+    stats = WaitStats()
+    if listing_ended and todo:
+        # листинг уже кончился — доделываем хвост из журнала, не пролистывая его заново
+        print("⏩ Листинг в прошлый раз пройден до конца — заново не открываем")
+    elif len(listing) < MAX_REVIEWS:
+        feed = ListingFeed(
+            START_URL, accept=accept, stats=stats, max_clicks=CLICK_MORE_TRIES,
+            date_from=DATE_FROM.isoformat(), on_emit=on_emit,
         )
-        context = browser.new_context(user_agent=UA, viewport=None)
-        page = context.new_page()
-
-        print("🌐 Открываю:", START_URL)
-        page.goto(START_URL, wait_until="domcontentloaded", timeout=0)
-
-        print("⏳ Жду появления отзывов...")
-        page.wait_for_selector("[data-test='responses__response']", timeout=PAGE_TIMEOUT_MS)
-        print("✅ Отзывы найдены!")
-
-        if results:
-            print(f"🔄 Загружен чекпоинт, уже собрано: {len(results)}")
-
-        # Жмём "Показать ещё"
-        tries = 0
-        while True:
-            count = page.eval_on_selector_all(
-                "[data-test='responses__response']",
-                "els => els.length"
-            )
-            print(f"📊 Сейчас карточек на странице: {count}")
-
-            if count >= MAX_REVIEWS:
-                break
-            if tries >= CLICK_MORE_TRIES:
-                print("⚠️ Достигнут лимит нажатий 'Показать ещё'.")
-                break
-
-            more_btn = page.query_selector("[data-test='responses__more-btn']")
-            if not more_btn:
-                print("ℹ️ Кнопка 'Показать ещё' не найдена.")
-                break
-
-            tries += 1
-            print(f"👉 [{tries}] Кликаю 'Показать ещё'...")
-            more_btn.click()
-            delay_ms(2500)
-            page.evaluate("() => window.scrollTo({ top: document.body.scrollHeight, behavior: 'instant' })")
-            delay_ms(1500)
-
-        # Список ссылок с листинга
-        print("📦 Собираю список ссылок с листинга...")
-        listing: List[Dict[str, Any]] = page.eval_on_selector_all(
-            "[data-test='responses__response']",
-            """
-            (nodes) => nodes.map((n) => {
-              const a = n.querySelector("h3 a, [data-test='link-text']");
-              const href = a?.getAttribute("href") || "";
-              const link = href.startsWith("http") ? href : href ? `https://www.banki.ru${href}` : null;
-
-              const idMatch = link?.match(/response\\/(\\d+)\\/?/);
-              const id = idMatch ? Number(idMatch[1]) : null;
-
-              const title =
-                n.querySelector("h3")?.textContent?.trim() ||
-                n.querySelector("[data-test='link-text']")?.textContent?.trim() ||
-                null;
-
-              return { id, link, title, date: null, text: null, rating: null };
-            })
-            """
+    limit = len(todo) + (max(0, MAX_REVIEWS - len(listing)) if feed is not None else 0)
+
+    store = ReviewStore()
+    done = 0
+
+    def on_result(r: Dict[str, Any], got: Optional[Dict[str, Optional[str]]]) -> None:
+        nonlocal done, processed_total, added_total
+        rid = r["id"]
+        done += 1
+        processed_total += 1
+        listed = len(todo) + (len(feed.items) if feed else 0)
+        print(f"📖 [{done}/{listed}] Готово {r['link']}")
+        if got is None:
+            return
+
+        date_iso = parse_date_iso_ddmmyyyy(got.get("date_raw"))
+        if not date_iso and got.get("text"):
+            m = re.search(r"(\d{2})\.(\d{2})\.(\d{4})", got["text"] or "")
+            if m:
+                date_iso = f"{m.group(3)}-{m.group(2)}-{m.group(1)}"
+
+        date_iso = date_iso or r.get("date")
+
+        # Фильтр по датам
+        if date_iso and not in_range(date_iso):
+            print(f"⏭️ Вне диапазона: {date_iso}")
+            skipped_ids.add(rid)
+            return
+
+        # r — карточка листинга из журнала, её не раздуваем текстом
+        record = {
+            "id": rid,
+            "link": r["link"],
+            "date": date_iso or None,
+            "title": got.get("title") or r.get("title") or None,
+            "text": got.get("text") or None,
+            "rating": got.get("rating") or None,
+        }
+        results.append(record)
+        store.upsert(SOURCE, record)
+        done_ids.add(rid)
+        added_total += 1
+
+        title_preview = (record["title"] or "")[:60]
+        print(f'   ✅ ok | id={rid} | rating={record["rating"] or "-"} | date={date_iso or "-"} | title="{title_preview}"')
+
+        if len(results) % SAVE_EVERY == 0:
+            save_checkpoint(f"autosave_{len(results)}")
+
+    print(f"🧭 Листинг и глубокий парсинг идут одновременно: вкладок {DETAIL_WORKERS}, очередь до {PIPELINE_QUEUE}")
+    try:
+        run_details(
+            todo, on_result, workers=DETAIL_WORKERS, pause_ms=POLITENESS_PAUSE_MS, stats=stats,
+            # новая партия — только когда у вкладок кончается работа; queue_size — потолок
+            feed=feed, limit=limit, low_water=DETAIL_WORKERS, queue_size=PIPELINE_QUEUE,
         )
+    finally:
+        store.close()
+        journal.close()
 
-        reviews = [r for r in (listing or []) if r.get("link") and r.get("id")]
-        reviews = reviews[:MAX_REVIEWS]
-        print(f"🔗 Отобрано ссылок для глубокого парсинга: {len(reviews)}")
-
-        done = 0
-        for r in reviews:
-            rid = r.get("id")
-            link = r.get("link")
-            if not rid or not link:
-                continue
-            if rid in done_ids:
-                continue  # уже в чекпоинте
-
-            done += 1
-            processed_total += 1
-            print(f"📖 [{done}/{len(reviews)}] Открываю {link}")
-
-            sub = context.new_page()
-            try:
-                sub.goto(link, wait_until="domcontentloaded", timeout=0)
-                try:
-                    sub.wait_for_selector("h1", timeout=10_000)
-                except PlaywrightTimeoutError:
-                    pass
-
-                got = {"title": None, "text": None, "rating": None, "dateIso": None}
-
-                # JSON-LD (берём первый script, как в твоём JS)
-                json_ld = None
-                try:
-                    json_ld = sub.eval_on_selector('script[type="application/ld+json"]', "el => el.textContent")
-                except Exception:
-                    json_ld = None
-
-                if json_ld:
-                    try:
-                        data = json.loads(json_ld)
-
-                        review_body_html = (
-                            data.get("reviewBody")
-                            or (data.get("author", {}) if isinstance(data.get("author"), dict) else {}).get("reviewBody")
-                            or (data.get("author", {}) if isinstance(data.get("author"), dict) else {}).get("description")
-                            or data.get("description")
-                            or None
-                        )
-
-                        full_text = sub.evaluate(
-                            """(html) => {
-                              if (!html) return null;
-                              const d = document.createElement("div");
-                              d.innerHTML = html;
-                              return d.innerText.replace(/\\s+/g, " ").trim();
-                            }""",
-                            review_body_html
-                        )
-
-                        rating = None
-                        rr = data.get("reviewRating")
-                        if rr is not None:
-                            if isinstance(rr, dict):
-                                rating = rr.get("ratingValue") or rr.get("value") or rr
-                            else:
-                                rating = rr
-
-                        title = data.get("name") or None
-
-                        got["text"] = full_text or None
-                        got["rating"] = str(rating) if rating is not None else None
-                        got["title"] = title or None
-                    except Exception:
-                        pass
-
-                # Фолбэки
-                if not got["text"]:
-                    try:
-                        got["text"] = sub.evaluate(
-                            """() => {
-                              const sels = [
-                                "[data-test='response-body']",
-                                ".responses__text",
-                                "article",
-                                ".page-container__body [itemprop='reviewBody']",
-                              ];
-                              for (const sel of sels) {
-                                const el = document.querySelector(sel);
-                                if (el) return el.innerText.replace(/\\s+/g, " ").trim();
-                              }
-                              return null;
-                            }"""
-                        )
-                    except Exception:
-                        got["text"] = None
-
-                if not got["title"]:
-                    try:
-                        got["title"] = sub.eval_on_selector("h1", "h => h.textContent.trim()")
-                    except Exception:
-                        got["title"] = r.get("title") or None
-
-                if not got["rating"]:
-                    try:
-                        got["rating"] = sub.evaluate(
-                            """() => {
-                              const gradeDigit = document.querySelector("[data-test='grade']")?.textContent?.trim();
-                              if (gradeDigit && /^\\d$/.test(gradeDigit)) return gradeDigit;
-
-                              const divWithValue = Array.from(document.querySelectorAll("div[value]"))
-                                .find((d) => /^\\d$/.test(d.getAttribute("value") || ""));
-                              return divWithValue?.getAttribute("value") || null;
-                            }"""
-                        )
-                    except Exception:
-                        got["rating"] = None
-
-                # Дата
-                date_iso = None
-                date_raw = None
-                try:
-                    date_raw = sub.eval_on_selector("time", "t => t.textContent.trim()")
-                except Exception:
-                    date_raw = None
-
-                if date_raw:
-                    date_iso = parse_date_iso_ddmmyyyy(date_raw)
-
-                if not date_iso and got["text"]:
-                    m = re.search(r"(\d{2})\.(\d{2})\.(\d{4})", got["text"] or "")
-                    if m:
-                        date_iso = f"{m.group(3)}-{m.group(2)}-{m.group(1)}"
-
-                r["title"] = got["title"] or r.get("title") or None
-                r["text"] = got["text"] or None
-                r["rating"] = got["rating"] or None
-                r["date"] = date_iso
-
-                # Фильтр по датам
-                if date_iso and not in_range(date_iso):
-                    print(f"⏭️ Вне диапазона: {date_iso}")
-                    continue
-
-                results.append({
-                    "id": rid,
-                    "link": link,
-                    "date": date_iso or None,
-                    "title": r["title"],
-                    "text": r["text"],
-                    "rating": r["rating"],
-                })
-                done_ids.add(rid)
-                added_total += 1
-
-                title_preview = (r["title"] or "")[:60]
-                print(f'   ✅ ok | id={rid} | rating={r["rating"] or "-"} | date={date_iso or "-"} | title="{title_preview}"')
-
-                if len(results) % SAVE_EVERY == 0:
-                    save_checkpoint(f"autosave_{len(results)}")
-
-            except Exception as e:
-                print(f"   ⚠️ Ошибка на {link}: {e}")
-            finally:
-                try:
-                    sub.close()
-                except Exception:
-                    pass
-                delay_ms(800)
-
-        # финальные сейвы
-        save_final()
+    if out_of_window:
+        print(f"⏭️ Вне диапазона по листингу: {out_of_window} — страницы не открывали")
+
+    # финальные сейвы
+    save_final()
 
-        print(f"🎉 Готово! Пройдено всего: {processed_total}, собрано по диапазону: {added_total}")
-        browser.close()
+    print(stats.report())
+    print(f"🎉 Готово! Пройдено всего: {processed_total}, собрано по диапазону: {added_total}")
 
 
 if __name__ == "__main__":
@@ -5,20 +5,40 @@ import sys
 import time
 import signal
 from datetime import datetime, date
-from typing import Optional, Dict, Any, List
+from typing import Callable, Optional, Dict, Any, List
 
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 
+from detail_http import make_session
+from journal import Journal, compact, replay
+from listing_harvest import CARD_SELECTOR, INSTALL_JS, harvest_new_cards, prune_harvested
+from listing_pages import LISTING_WORKERS, ListingFetchError, ListingPages
+from readiness import WaitStats, wait_for_harvest
+
 START_URL = "https://www.banki.ru/services/responses/bank/gazprombank/?is_countable=on"
 
+# 🔧 режим обхода листинга:
+#   "pages" — страницы ?page=N по HTTP, окно дат ищется галопом + бинарным поиском,
+#             нужные страницы качаются параллельно; при неудаче — откат на "click"
+#   "click" — «Показать ещё» в браузере
+LISTING_MODE = "pages"
+
 # 🔧 настройки
 SAVE_EVERY_ITEMS = 200
 SAVE_EVERY_MS = 30_000
-CHECKPOINT_FILE = "links.json"
+CHECKPOINT_FILE = "links.json"          # итоговый экспорт (компакция журнала)
+JOURNAL_FILE = "links.journal.jsonl"    # append-only журнал, по нему идёт resume
 
 CLICK_MORE_TRIES = 5000
-WAIT_AFTER_CLICK_MS = 2500
-SCROLL_AFTER_CLICK_MS = 1500
+MORE_BTN_SELECTOR = "[data-test='responses__more-btn']"
+# после клика ждём появления новых карточек, а не фиксированные 2.5 + 1.5 с;
+# таймаут — только потолок на случай, если подгрузка зависла
+MORE_CARDS_TIMEOUT_MS = 15_000
+
+# 🔧 чистка DOM: снятые карточки прячутся (display:none), видимыми остаются последние PRUNE_KEEP_LAST
+# (сайту нужен «хвост» списка, чтобы подгружать дальше) — время батча не растёт
+PRUNE_DOM = True
+PRUNE_KEEP_LAST = 1
 
 # 🔧 фильтр по датам
 DATE_FROM = date(2025, 1, 1)
@@ -28,10 +48,6 @@ EARLY_STOP_ON_OLD = True
 OLD_BATCH_STREAK_TO_STOP = 3
 
 
-def delay_ms(ms: int) -> None:
-    time.sleep(ms / 1000.0)
-
-
 def parse_date_iso(date_raw: Optional[str]) -> Optional[str]:
     """
     "dd.mm.yyyy" -> "yyyy-mm-dd"
@@ -57,54 +73,110 @@ def in_range(iso: Optional[str]) -> bool:
     return (d >= DATE_FROM) and (d <= DATE_TO)
 
 
-def read_checkpoint(path: str) -> List[Dict[str, Any]]:
-    if not os.path.exists(path):
-        return []
+def harvest_by_pages(ids: set, add_item: Callable[[Dict[str, Any]], None]) -> bool:
+    """
+    Листинг по номерам страниц. False — сервер не отдал карточки в HTML,
+    нужен обход через браузер.
+    """
+    session = make_session(LISTING_WORKERS)
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        if isinstance(data, list):
-            return data
-        return []
-    except Exception:
-        print("⚠️ Чекпоинт повреждён — начнём заново")
-        return []
-
-
-def write_checkpoint(path: str, items: List[Dict[str, Any]]) -> None:
-    tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(items, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, path)
+        pages = ListingPages(session, START_URL)
+        try:
+            if not pages.cards(1):
+                print("⚠️ В HTML первой страницы нет карточек — переключаюсь на «Показать ещё»")
+                return False
+            window = pages.find_window(DATE_FROM, DATE_TO)
+            probes = pages.fetched
+            cards = pages.fetch_range(*window) if window else []
+        except ListingFetchError as e:
+            # окно по недокачанным страницам было бы неверным — идём через браузер
+            print(f"⚠️ {e} — переключаюсь на «Показать ещё»")
+            return False
+
+        if window is None:
+            print(f"ℹ️ Отзывов в диапазоне {DATE_FROM} — {DATE_TO} нет (проверено страниц: {pages.fetched})")
+            return True
+
+        first, last = window
+        print(f"🎯 Окно дат: страницы {first}–{last} (проб при поиске: {probes})")
+
+        added = 0
+        skipped = 0
+        for b in cards:
+            if not in_range(b.get("date")):
+                skipped += 1
+                continue
+            if b["id"] in ids:
+                continue
+            add_item(b)
+            added += 1
+
+        print(f"📦 Страниц скачано: {pages.fetched} | +{added} новых | ⏭️ вне диапазона {skipped} | всего={len(ids)}")
+        return True
+    finally:
+        session.close()
 
 
 def main() -> None:
     print("🚀 parser_links.py — сбор ссылок c фильтром по датам на листинге")
 
-    # 1) Загружаем чекпоинт
-    items: List[Dict[str, Any]] = read_checkpoint(CHECKPOINT_FILE)
+    # 1) Восстанавливаемся из журнала (links.json — только итоговый экспорт)
+    items: List[Dict[str, Any]] = []
+    ids = set()
+    for x in replay(JOURNAL_FILE):
+        if x.get("id") in ids:
+            continue
+        ids.add(x.get("id"))
+        items.append(x)
     if items:
-        print(f"🔄 Найдено в чекпоинте: {len(items)} записей")
-    ids = set(x.get("id") for x in items if isinstance(x, dict))
+        print(f"🔄 Найдено в журнале: {len(items)} записей")
+
+    journal = Journal(JOURNAL_FILE, fsync_every=SAVE_EVERY_ITEMS)
 
-    # автосейв
+    # старый чекпоинт без журнала — переносим один раз
+    if not items and os.path.exists(CHECKPOINT_FILE):
+        try:
+            with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except Exception:
+            print("⚠️ Чекпоинт повреждён — начнём заново")
+            legacy = []
+        for x in legacy if isinstance(legacy, list) else []:
+            if isinstance(x, dict) and x.get("id") not in ids:
+                ids.add(x.get("id"))
+                items.append(x)
+                journal.append(x)
+        journal.sync()
+        if items:
+            print(f"🔄 Перенесено из {CHECKPOINT_FILE} в журнал: {len(items)} записей")
+
+    def add_item(item: Dict[str, Any]) -> None:
+        nonlocal added_since_last_save
+        ids.add(item["id"])
+        items.append(item)
+        journal.append(item)
+        added_since_last_save += 1
+
+    # автосейв: fsync журнала; полный links.json пишется только при компакции
     last_saved_at = time.time()
     added_since_last_save = 0
 
-    def save_now(reason: str = "manual") -> None:
+    def save_now(reason: str = "manual", compact_now: bool = False) -> None:
         nonlocal last_saved_at, added_since_last_save
         try:
-            write_checkpoint(CHECKPOINT_FILE, items)
+            journal.sync()
+            if compact_now:
+                compact(items, CHECKPOINT_FILE)
             last_saved_at = time.time()
             added_since_last_save = 0
-            print(f"💾 Сохранено ({reason}): всего {len(items)}")
+            print(f"💾 Сохранено ({reason}): всего {len(items)}" + (f" → {CHECKPOINT_FILE}" if compact_now else ""))
         except Exception as e:
             print("⚠️ Ошибка при сохранении:", str(e))
 
     # страховочные обработчики
     def emergency_save(msg: str, exit_code: int = 1) -> None:
         print(f"\n🛑 {msg} — экстренное сохранение {len(items)} элементов")
-        save_now("emergency")
+        save_now("emergency", compact_now=True)
         raise SystemExit(exit_code)
 
     def handle_sigint(signum, frame):
@@ -112,6 +184,15 @@ def main() -> None:
 
     signal.signal(signal.SIGINT, handle_sigint)
 
+    if LISTING_MODE == "pages":
+        try:
+            if harvest_by_pages(ids, add_item):
+                save_now("final", compact_now=True)
+                print("🎉 Готово. Всего собрано:", len(items))
+                return
+        except Exception as e:
+            print("⚠️ Постраничный режим не сработал:", repr(e))
+
     try:
         with sync_playwright() as p:
             browser = p.chromium.launch(
@@ -135,38 +216,23 @@ def main() -> None:
                 page.wait_for_selector("[data-test='responses__response']", timeout=60_000)
             except PlaywrightTimeoutError:
                 print("❌ Не дождался карточек responses__response — стоп.")
-                save_now("final_timeout")
+                save_now("final_timeout", compact_now=True)
                 browser.close()
                 return
 
             print("✅ Стартовая партия карточек прогружена")
+            page.evaluate(INSTALL_JS, CARD_SELECTOR)
+            stats = WaitStats()
 
             tries = 0
             old_batch_streak = 0
+            pruned_total = 0
 
             while tries < CLICK_MORE_TRIES:
                 tries += 1
 
-                # Забираем батч с DOM (похоже на page.$$eval)
-                batch = page.eval_on_selector_all(
-                    "[data-test='responses__response']",
-                    """
-                    (nodes) => nodes.map((n) => {
-                      const a = n.querySelector("h3 a, [data-test='link-text']");
-                      const href = a?.getAttribute("href") || "";
-                      const link = href ? (href.startsWith("http") ? href : `https://www.banki.ru${href}`) : null;
-                      const idMatch = link?.match(/response\\/(\\d+)/);
-                      const id = idMatch ? Number(idMatch[1]) : null;
-                      const title =
-                        n.querySelector("h3")?.textContent?.trim() ||
-                        n.querySelector("[data-test='link-text']")?.textContent?.trim() ||
-                        null;
-                      const dateRaw = n.querySelector(".Responsesstyled__StyledItemSmallText-sc-150koqm-4")
-                        ?.textContent?.trim() || null;
-                      return { id, link, title, dateRaw };
-                    })
-                    """
-                )
+                # Забираем только карточки, появившиеся с прошлого батча
+                batch, on_page = harvest_new_cards(page)
 
                 added = 0
                 skipped = 0
@@ -192,25 +258,26 @@ def main() -> None:
                         dups += 1
                         continue
 
-                    ids.add(bid)
-                    items.append({
+                    add_item({
                         "id": bid,
                         "link": b["link"],
                         "title": b.get("title") or None,
                         "date": date_iso
                     })
                     added += 1
-                    added_since_last_save += 1
+
+                if PRUNE_DOM and batch:
+                    pruned_total += prune_harvested(page, PRUNE_KEEP_LAST)
 
                 print(
-                    f"📦 Батч#{tries}: карточек={len(batch) if batch else 0} | "
+                    f"📦 Батч#{tries}: новых карточек={len(batch)} (снято всего {on_page}, спрятано {pruned_total}) | "
                     f"+{added} новых | 🔁 дубликатов {dups} | "
                     f"⏭️ вне диапазона {skipped} | всего={len(items)}"
                 )
 
                 # ранняя остановка
-                if EARLY_STOP_ON_OLD:
-                    if (batch and len(batch) > 0 and batch_all_old and added == 0):
+                if EARLY_STOP_ON_OLD and batch:
+                    if batch_all_old and added == 0:
                         old_batch_streak += 1
                         print(f"⏳ Пошли только старые даты (стрик={old_batch_streak}/{OLD_BATCH_STREAK_TO_STOP})")
                     else:
@@ -228,19 +295,20 @@ def main() -> None:
                     save_now(f"timer>={SAVE_EVERY_MS}ms")
 
                 # клик "Показать ещё"
-                more_btn = page.query_selector("[data-test='responses__more-btn']")
+                more_btn = page.query_selector(MORE_BTN_SELECTOR)
                 if not more_btn:
                     print("❌ Кнопка 'Показать ещё' не найдена — стоп.")
                     break
 
                 print(f"👉 [{tries}] Кликаю «Показать ещё»…")
                 more_btn.click()
-                delay_ms(WAIT_AFTER_CLICK_MS)
                 page.evaluate("() => window.scrollTo({ top: document.body.scrollHeight, behavior: 'instant' })")
-                delay_ms(SCROLL_AFTER_CLICK_MS)
+                if not wait_for_harvest(page, MORE_BTN_SELECTOR, MORE_CARDS_TIMEOUT_MS, stats):
+                    print(f"⚠️ За {MORE_CARDS_TIMEOUT_MS} мс новых карточек не появилось")
 
-            save_now("final")
+            save_now("final", compact_now=True)
             print("🎉 Готово. Всего собрано:", len(items))
+            print(stats.report())
 
             in_range_count = sum(1 for x in items if in_range(x.get("date")))
             print(f"📊 Итог: в диапазоне={in_range_count}, всего={len(items)}")
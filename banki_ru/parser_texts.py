@@ -1,23 +1,44 @@
 import json
 import os
 import re
+import sqlite3
+import sys
 import time
 import signal
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from async_detail import run_details
+from detail_http import fetch_html, make_session, parse_detail_html
+from readiness import WaitStats
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from review_store import ReviewStore
 
 
 LINKS_FILE = "links.json"
 OUTPUT_FILE = "reviews.json"
-CHECKPOINT_FILE = "checkpoint_texts.json"
-SAVE_EVERY = 10
+LEGACY_CHECKPOINT_FILE = "checkpoint_texts.json"
+LEGACY_SQLITE_FILE = "checkpoint_texts.sqlite"   # чекпоинт до общей базы review_store
+# свой ключ источника в review_store: parser.py / parser_all.py пишут в "banki_ru"
+# без фильтра по датам и города, их записи не должны попадать ни в проверку
+# «уже сделано», ни в reviews.json этого скрипта
+SOURCE = "banki_ru_texts"
 START_INDEX = 0
 
 DATE_FROM = date(2025, 1, 1)
 DATE_TO   = date(2026, 2, 8)
 
+# 🔧 режим загрузки страниц отзывов:
+#   "http"    — страницы качаются без браузера (keep-alive пул), Playwright только фолбэк
+#   "browser" — все страницы открываются в пуле вкладок Playwright
+DETAIL_MODE = "http"
+HTTP_WORKERS = 4
+BROWSER_WORKERS = 4   # вкладок в пуле async-движка
+POLITENESS_PAUSE_MS = 0   # вежливая пауза вкладки между отзывами, мс (0 — без неё)
+HTTP_DELAY_MS = 200   # пауза каждого воркера между запросами
+
 
 def delay_ms(ms: int) -> None:
     time.sleep(ms / 1000.0)
@@ -55,18 +76,65 @@ def read_json(path: str, default: Any) -> Any:
         return default
 
 
-def write_json_atomic(path: str, data: Any) -> None:
-    tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, path)
+def import_legacy_checkpoint(store: ReviewStore) -> None:
+    """
+    Старые чекпоинты переносятся в базу один раз: сначала SQLite-чекпоинт
+    (после переноса файл удаляется вместе с -wal/-shm), иначе JSON.
+    """
+    if store.count(SOURCE) > 0:
+        return
+
+    if os.path.exists(LEGACY_SQLITE_FILE):
+        conn = sqlite3.connect(LEGACY_SQLITE_FILE)
+        try:
+            rows = conn.execute("SELECT data FROM reviews ORDER BY seq").fetchall()
+        finally:
+            conn.close()
+        n = store.upsert_many(SOURCE, (json.loads(data) for (data,) in rows))
+        print(f"🔄 Перенесено из {LEGACY_SQLITE_FILE}: {n}")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(LEGACY_SQLITE_FILE + suffix):
+                os.remove(LEGACY_SQLITE_FILE + suffix)
+        return
+
+    if os.path.exists(LEGACY_CHECKPOINT_FILE):
+        legacy = read_json(LEGACY_CHECKPOINT_FILE, {})
+        if isinstance(legacy, dict):
+            n = store.upsert_many(SOURCE, legacy.get("reviews") or [])
+            print(f"🔄 Перенесено из {LEGACY_CHECKPOINT_FILE}: {n}")
 
 
-def strip_html(s: str) -> str:
-    # убираем теги + нормализуем пробелы
-    s = re.sub(r"<[^>]*>", "", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+def extract_with_http(session: Any, r: Dict[str, Any]) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Та же выжимка, но из серверного HTML без браузера.
+    None — страницу надо открыть в Playwright (нет JSON-LD, не 200, ошибка сети).
+    """
+    try:
+        page_html = fetch_html(session, r["link"])
+        if not page_html:
+            return None
+        return parse_detail_html(page_html)
+    except Exception as e:
+        print(f"⚠️ HTTP-ошибка на id={r.get('id')}: {e}")
+        return None
+    finally:
+        delay_ms(HTTP_DELAY_MS)
+
+
+def iter_http_results(
+    pending: List[Tuple[int, Dict[str, Any]]]
+) -> Iterator[Tuple[int, Dict[str, Any], Optional[Dict[str, Optional[str]]]]]:
+    """
+    Качает страницы в HTTP_WORKERS потоков, отдаёт результаты в исходном порядке.
+    """
+    session = make_session(HTTP_WORKERS)
+    try:
+        with ThreadPoolExecutor(max_workers=HTTP_WORKERS) as pool:
+            got_iter = pool.map(lambda item: extract_with_http(session, item[1]), pending)
+            for (i, r), got in zip(pending, got_iter):
+                yield i, r, got
+    finally:
+        session.close()
 
 
 def main() -> None:
@@ -77,239 +145,133 @@ def main() -> None:
         print("⚠️ Файл links.json пустой или не список")
         return
 
-    checkpoint = read_json(CHECKPOINT_FILE, {"doneIds": [], "reviews": []})
-    if not isinstance(checkpoint, dict):
-        checkpoint = {"doneIds": [], "reviews": []}
+    # чекпоинт — общая база отзывов (review_store), resume = поиск по ключу
+    store = ReviewStore()
 
-    done_ids = set(checkpoint.get("doneIds") or [])
-    results: List[Dict[str, Any]] = checkpoint.get("reviews") or []
-    if results:
-        print(f"🔄 Чекпоинт: уже собрано {len(results)}")
+    import_legacy_checkpoint(store)
 
-    # Экстренное сохранение
-    def save_all(reason: str) -> None:
-        write_json_atomic(CHECKPOINT_FILE, {"doneIds": sorted(list(done_ids)), "reviews": results})
-        write_json_atomic(OUTPUT_FILE, results)
-        print(f"💾 Сохранено ({reason}): reviews={len(results)} doneIds={len(done_ids)}")
+    saved_total = store.count(SOURCE)
+    if saved_total:
+        print(f"🔄 Чекпоинт: уже собрано {saved_total}")
+
+    # отзывы уже закоммичены по одному — в конце только экспорт reviews.json
+    def export_all(reason: str) -> None:
+        n = store.export_json(SOURCE, OUTPUT_FILE)
+        print(f"💾 Экспорт ({reason}): {OUTPUT_FILE} — reviews={n}")
 
     def handle_sigint(signum, frame):
-        print("\n🛑 SIGINT — экстренное сохранение")
-        save_all("emergency_sigint")
+        print("\n🛑 SIGINT — экспорт собранного")
+        export_all("emergency_sigint")
+        store.close()
         raise SystemExit(1)
 
     signal.signal(signal.SIGINT, handle_sigint)
 
     processed_total = 0
     skipped_by_date = 0
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=False,
-            args=["--no-sandbox", "--disable-setuid-sandbox"],
-        )
-        context = browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/127.0.0.0 Safari/537.36"
-            ),
-            viewport=None,
-        )
-
-        for i in range(START_INDEX, len(links)):
-            r = links[i]
-            if not isinstance(r, dict):
-                continue
-
-            rid = r.get("id")
-            link = r.get("link")
-            if not rid or not link:
-                continue
-            if rid in done_ids:
-                continue
-
+    skipped_by_listing = 0
+    via_http = 0
+    via_browser = 0
+
+    pending: List[Tuple[int, Dict[str, Any]]] = []
+    for i in range(START_INDEX, len(links)):
+        r = links[i]
+        if not isinstance(r, dict):
+            continue
+        if not r.get("id") or not r.get("link"):
+            continue
+        # дата с листинга известна заранее — вне диапазона страницу даже не открываем
+        if not in_range(r.get("date")):
+            skipped_by_listing += 1
+            continue
+        if store.has(SOURCE, r["id"]):
+            continue
+        pending.append((i, r))
+    if skipped_by_listing:
+        print(f"⏭️ Вне диапазона по дате листинга: {skipped_by_listing} — без запросов")
+
+    def accept(r: Dict[str, Any], got: Dict[str, Optional[str]]) -> None:
+        nonlocal skipped_by_date, saved_total
+        rid = r["id"]
+
+        date_iso = parse_date_iso_ddmmyyyy(got.get("date_raw"))
+
+        if not date_iso and got.get("text"):
+            m = re.search(r"(\d{2})\.(\d{2})\.(\d{4})", got["text"] or "")
+            if m:
+                date_iso = f"{m.group(3)}-{m.group(2)}-{m.group(1)}"
+        date_iso = date_iso or r.get("date")
+
+        # дата со страницы подтверждает листинговую
+        if date_iso and not in_range(date_iso):
+            print(f"⏭️ Пропущен вне диапазона: {date_iso}")
+            skipped_by_date += 1
+            return
+
+        store.upsert(SOURCE, {
+            "id": rid,
+            "link": r["link"],
+            "date": date_iso,
+            "title": got.get("title") or r.get("title"),
+            "text": got.get("text"),
+            "rating": got.get("rating"),
+            "city": got.get("city"),
+        })
+        saved_total += 1
+
+        title_preview = (got.get("title") or "")[:60]
+        print(f'   ✅ ok | id={rid} | date={date_iso or "-"} | rating={got.get("rating") or "-"} | title="{title_preview}"')
+
+    browser_queue: List[Dict[str, Any]] = []
+
+    if DETAIL_MODE == "http":
+        print(f"🌐 HTTP-режим: {HTTP_WORKERS} потоков, Playwright — только фолбэк")
+        for i, r, got in iter_http_results(pending):
             processed_total = i + 1
-            print(f"📖 {processed_total}/{len(links)} — id={rid}")
+            print(f"📖 {processed_total}/{len(links)} — id={r['id']}")
 
-            page = context.new_page()
+            if got is None:
+                print(f"   🧭 В HTML нет JSON-LD — отложено для браузера (id={r['id']})")
+                browser_queue.append(r)
+                continue
 
+            via_http += 1
             try:
-                page.goto(link, wait_until="domcontentloaded", timeout=0)
-                delay_ms(2500)
-                try:
-                    page.wait_for_selector("h1, [data-test='response-body']", timeout=15_000)
-                except PlaywrightTimeoutError:
-                    pass
-
-                got: Dict[str, Optional[str]] = {"title": None, "text": None, "rating": None, "date": None}
-
-                # === JSON-LD ===
-                json_ld_text = None
-                try:
-                    json_ld_text = page.eval_on_selector(
-                        'script[type="application/ld+json"]',
-                        "el => el.textContent"
-                    )
-                except Exception:
-                    json_ld_text = None
-
-                if json_ld_text:
-                    try:
-                        clean = re.sub(r"[\u0000-\u001F]+", " ", json_ld_text)
-                        data = json.loads(clean)
-
-                        review_body_html = (
-                            data.get("reviewBody")
-                            or (data.get("author", {}) if isinstance(data.get("author"), dict) else {}).get("reviewBody")
-                            or (data.get("author", {}) if isinstance(data.get("author"), dict) else {}).get("description")
-                            or data.get("description")
-                            or None
-                        )
-
-                        full_text = None
-                        if review_body_html:
-                            # декодируем html-сущности через DOM
-                            decoded = page.evaluate(
-                                """(raw) => {
-                                  const t = document.createElement("textarea");
-                                  t.innerHTML = raw;
-                                  return t.value;
-                                }""",
-                                review_body_html
-                            )
-                            if isinstance(decoded, str):
-                                full_text = strip_html(decoded)
-
-                        rating = None
-                        rr = data.get("reviewRating")
-                        if rr is not None:
-                            if isinstance(rr, dict):
-                                rating = rr.get("ratingValue") or rr.get("value") or rr
-                            else:
-                                rating = rr
-
-                        got["text"] = full_text or None
-                        got["rating"] = str(rating) if rating is not None else None
-                        got["title"] = data.get("name") or None
-
-                    except Exception as e:
-                        print(f"⚠️ JSON-LD parse error on id={rid}: {e}")
-
-                # === Фолбэки ===
-                if not got["text"]:
-                    try:
-                        got["text"] = page.evaluate(
-                            """() => {
-                              const sels = [
-                                "[data-test='response-body']",
-                                ".responses__text",
-                                "article",
-                                ".page-container__body [itemprop='reviewBody']",
-                              ];
-                              for (const sel of sels) {
-                                const el = document.querySelector(sel);
-                                if (el) return el.innerText.replace(/\\s+/g, " ").trim();
-                              }
-                              return null;
-                            }"""
-                        )
-                    except Exception:
-                        got["text"] = None
-
-                if not got["title"]:
-                    try:
-                        got["title"] = page.eval_on_selector("h1", "h => h.textContent.trim()")
-                    except Exception:
-                        got["title"] = r.get("title") or None
-
-                if not got["rating"]:
-                    try:
-                        got["rating"] = page.evaluate(
-                            """() => {
-                              const gradeDigit = document.querySelector("[data-test='grade']")?.textContent?.trim();
-                              if (gradeDigit && /^\\d$/.test(gradeDigit)) return gradeDigit;
-
-                              const divWithValue = Array.from(document.querySelectorAll("div[value]"))
-                                .find((d) => /^\\d$/.test(d.getAttribute("value") || ""));
-                              return divWithValue?.getAttribute("value") || null;
-                            }"""
-                        )
-                    except Exception:
-                        got["rating"] = None
-
-                # === Город ===
-                city = None
-                try:
-                    city = page.eval_on_selector(".l3a372298", "el => el.textContent.trim()")
-                    if isinstance(city, str) and city:
-                        city = re.sub(r"\s*\(.*?\)\s*$", "", city).strip()
-                except Exception:
-                    city = None
-
-                # === Дата ===
-                date_iso = None
-                date_raw = None
-
-                try:
-                    date_raw = page.eval_on_selector("time", "t => t.textContent.trim()")
-                except Exception:
-                    date_raw = None
-
-                if not date_raw:
-                    try:
-                        date_raw = page.eval_on_selector(".l51115aff .l10fac986", "el => el.textContent.trim()")
-                    except Exception:
-                        date_raw = None
-
-                if date_raw:
-                    date_iso = parse_date_iso_ddmmyyyy(date_raw)
-
-                if not date_iso and got.get("text"):
-                    m = re.search(r"(\d{2})\.(\d{2})\.(\d{4})", got["text"] or "")
-                    if m:
-                        date_iso = f"{m.group(3)}-{m.group(2)}-{m.group(1)}"
-
-                # фильтр по датам
-                if date_iso and not in_range(date_iso):
-                    print(f"⏭️ Пропущен вне диапазона: {date_iso}")
-                    skipped_by_date += 1
-                    continue
-
-                results.append({
-                    "id": rid,
-                    "link": link,
-                    "date": date_iso,
-                    "title": got.get("title") or r.get("title"),
-                    "text": got.get("text"),
-                    "rating": got.get("rating"),
-                    "city": city,
-                })
-                done_ids.add(rid)
-
-                title_preview = (got.get("title") or "")[:60]
-                print(f'   ✅ ok | id={rid} | date={date_iso or "-"} | rating={got.get("rating") or "-"} | title="{title_preview}"')
-
-                if (len(results) % SAVE_EVERY) == 0:
-                    save_all(f"autosave_{len(results)}")
-
+                accept(r, got)
+            except Exception as e:
+                print(f"⚠️ Ошибка на {r['link']}: {e}")
+    else:
+        browser_queue = [r for _, r in pending]
+        if pending:
+            processed_total = pending[-1][0] + 1
+
+    stats = WaitStats()
+    if browser_queue:
+        print(f"🧭 Открываю в браузере: {len(browser_queue)} отзывов, вкладок {BROWSER_WORKERS}")
+
+        def on_result(r: Dict[str, Any], got: Optional[Dict[str, Optional[str]]]) -> None:
+            nonlocal via_browser
+            if got is None:
+                return
+            via_browser += 1
+            try:
+                accept(r, got)
             except Exception as e:
-                print(f"⚠️ Ошибка на {link}: {e}")
-            finally:
-                try:
-                    page.close()
-                except Exception as e:
-                    print(f"⚠️ Ошибка при закрытии вкладки (id={rid}): {e}")
-                delay_ms(1000)
+                print(f"⚠️ Ошибка на {r['link']}: {e}")
 
-        save_all("final")
+        run_details(browser_queue, on_result, workers=BROWSER_WORKERS, pause_ms=POLITENESS_PAUSE_MS, stats=stats)
 
-        print("\n🎉 Готово!")
-        print(f"📊 Всего обработано (индекс последнего): {processed_total}")
-        print(f"✅ Сохранено в диапазоне: {len(results)}")
-        print(f"⏭️ Пропущено по датам: {skipped_by_date}")
+    export_all("final")
+    store.close()
 
-        browser.close()
+    print("\n🎉 Готово!")
+    print(f"📊 Всего обработано (индекс последнего): {processed_total}")
+    print(f"✅ Сохранено в диапазоне: {saved_total}")
+    print(f"⏭️ Пропущено по датам: листинг {skipped_by_listing}, страница отзыва {skipped_by_date}")
+    print(f"🌐 Через HTTP: {via_http} | 🧭 через браузер: {via_browser}")
+    if browser_queue:
+        print(stats.report())
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,127 @@
+import asyncio
+import time
+from typing import Any
+
+from playwright.async_api import TimeoutError as AsyncTimeoutError
+from playwright.sync_api import TimeoutError as SyncTimeoutError
+
+
+# Условия готовности (проверяются в странице через wait_for_function)
+# --- листинг: карточек стало больше, чем было до клика
+MORE_CARDS_JS = "([sel, old]) => document.querySelectorAll(sel).length > old"
+# --- листинг с listing_harvest: в буфере наблюдателя появились новые карточки (O(1))
+HARVEST_BUFFER_JS = "() => (window.__harvest?.buffer.length || 0) > 0"
+# --- кнопка «Показать ещё» снова активна (или исчезла — значит листинг кончился)
+MORE_BTN_READY_JS = """
+(sel) => {
+  const b = document.querySelector(sel);
+  return !b || (!b.disabled && b.getAttribute("aria-busy") !== "true" && b.getAttribute("aria-disabled") !== "true");
+}
+"""
+# --- страница отзыва: JSON-LD или тело отзыва уже в DOM
+DETAIL_READY_SELECTOR = "script[type=\"application/ld+json\"], [data-test='response-body']"
+
+POLL_MS = 100
+
+
+class WaitStats:
+    """
+    Учёт времени: сколько ушло на «слепые» паузы и сколько — на ожидание
+    реальных событий (и сколько ожиданий закончилось таймаутом).
+    Воркеры ждут параллельно, поэтому slept_s/event_s — сумма по всем воркерам
+    (может быть больше времени прогона); в отчёте есть и среднее на воркер.
+    """
+
+    def __init__(self, workers: int = 1) -> None:
+        self.started = time.monotonic()
+        self.workers = max(1, workers)   # сколько воркеров пишут в учёт одновременно
+        self.slept_s = 0.0
+        self.event_s = 0.0
+        self.events = 0
+        self.timeouts = 0
+
+    def sleep(self, ms: int) -> None:
+        if ms <= 0:
+            return
+        time.sleep(ms / 1000.0)
+        self.slept_s += ms / 1000.0
+
+    async def asleep(self, ms: int) -> None:
+        if ms <= 0:
+            return
+        await asyncio.sleep(ms / 1000.0)
+        self.slept_s += ms / 1000.0
+
+    def account(self, started: float, ok: bool) -> bool:
+        """Учесть одно ожидание события, начатое в started; возвращает ok."""
+        self.event_s += time.monotonic() - started
+        if ok:
+            self.events += 1
+        else:
+            self.timeouts += 1
+        return ok
+
+    def report(self) -> str:
+        wall = time.monotonic() - self.started
+        n = self.workers
+        return (
+            f"⏱️ Время прогона {wall:.1f} с | сумма по {n} воркерам — паузы: {self.slept_s:.1f} с, "
+            f"ожидание событий: {self.event_s:.1f} с | на воркер: паузы {self.slept_s / n:.1f} с, "
+            f"события {self.event_s / n:.1f} с "
+            f"(сработало {self.events}, таймаутов {self.timeouts})"
+        )
+
+
+def wait_until(page: Any, js: str, arg: Any, timeout_ms: int, stats: WaitStats) -> bool:
+    """Ждёт, пока js(arg) в странице станет truthy. False — вышли по таймауту."""
+    started = time.monotonic()
+    try:
+        page.wait_for_function(js, arg=arg, timeout=timeout_ms, polling=POLL_MS)
+        return stats.account(started, True)
+    except SyncTimeoutError:
+        return stats.account(started, False)
+
+
+def wait_for_more_cards(page: Any, card_sel: str, old_count: int, more_btn_sel: str,
+                        timeout_ms: int, stats: WaitStats) -> bool:
+    """После клика «Показать ещё»: новых карточек больше старого числа + кнопка снова активна."""
+    if not wait_until(page, MORE_CARDS_JS, [card_sel, old_count], timeout_ms, stats):
+        return False
+    wait_until(page, MORE_BTN_READY_JS, more_btn_sel, timeout_ms, stats)
+    return True
+
+
+def wait_for_harvest(page: Any, more_btn_sel: str, timeout_ms: int, stats: WaitStats) -> bool:
+    """То же, но по буферу listing_harvest — без подсчёта всех карточек в DOM."""
+    if not wait_until(page, HARVEST_BUFFER_JS, None, timeout_ms, stats):
+        return False
+    wait_until(page, MORE_BTN_READY_JS, more_btn_sel, timeout_ms, stats)
+    return True
+
+
+async def await_until(page: Any, js: str, arg: Any, timeout_ms: int, stats: WaitStats) -> bool:
+    """Async-вариант wait_until."""
+    started = time.monotonic()
+    try:
+        await page.wait_for_function(js, arg=arg, timeout=timeout_ms, polling=POLL_MS)
+        return stats.account(started, True)
+    except AsyncTimeoutError:
+        return stats.account(started, False)
+
+
+async def await_harvest(page: Any, more_btn_sel: str, timeout_ms: int, stats: WaitStats) -> bool:
+    """Async-вариант wait_for_harvest."""
+    if not await await_until(page, HARVEST_BUFFER_JS, None, timeout_ms, stats):
+        return False
+    await await_until(page, MORE_BTN_READY_JS, more_btn_sel, timeout_ms, stats)
+    return True
+
+
+async def await_detail_ready(page: Any, timeout_ms: int, stats: WaitStats) -> bool:
+    """Страница отзыва готова, как только в DOM есть JSON-LD или тело отзыва."""
+    started = time.monotonic()
+    try:
+        await page.wait_for_selector(DETAIL_READY_SELECTOR, state="attached", timeout=timeout_ms)
+        return stats.account(started, True)
+    except AsyncTimeoutError:
+        return stats.account(started, False)
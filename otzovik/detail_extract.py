@@ -0,0 +1,261 @@
+import json
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from lxml import html as lxml_html
+from selenium import webdriver
+
+
+# Все селекторы страницы отзыва в одном месте (и для execute_script, и для разбора page_source)
+SELECTORS: Dict[str, str] = {
+    "container": '.review-contents[itemprop="review"]',
+    "date": 'meta[itemprop="datePublished"]',
+    "title": "h1",
+    "plus": ".review-plus",
+    "minus": ".review-minus",
+    "body": '.review-body.description[itemprop="description"]',
+    "ratingMeta": 'meta[itemprop="ratingValue"]',
+    "ratingScore": ".rating-score span",
+    "location": ".user-location",
+}
+
+# Один execute_script на страницу: «сырые» значения всех полей, обработка — в build_review()
+EXTRACT_JS = """
+const sel = arguments[0];
+const root = document.querySelector(sel.container);
+if (!root) return null;
+const text = (q) => { const el = root.querySelector(q); return el ? el.innerText : null; };
+const attr = (q, a) => { const el = root.querySelector(q); return el ? el.getAttribute(a) : null; };
+return {
+  date: attr(sel.date, "content"),
+  title: text(sel.title),
+  plus: text(sel.plus),
+  minus: text(sel.minus),
+  body: text(sel.body),
+  ratingMeta: attr(sel.ratingMeta, "content"),
+  ratingScore: text(sel.ratingScore),
+  location: text(sel.location),
+};
+"""
+
+# Сохранённые страницы отзывов и эталонные записи для --check / --bench
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(HERE, "fixtures")
+FIXTURE_RECORDS = os.path.join(HERE, "otzovik_detailed_reviews.json")
+
+# теги, после которых innerText ставит перенос строки
+_BLOCK_TAGS = {"br", "p", "div", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+def clean_text(text: Optional[str]) -> Optional[str]:
+    if not text:
+        return None
+    t = re.sub(r"\s+", " ", text).strip()
+    return t or None
+
+
+def extract_city(location_text: Optional[str]) -> Optional[str]:
+    if not location_text:
+        return None
+    m = re.search(r"(?:Россия,\s*)?(.+?)$", location_text)
+    if m and m.group(1):
+        return clean_text(m.group(1).upper())
+    return None
+
+
+def _inner_text(el: Any) -> str:
+    # text_content() склеивает соседние блоки без пробела — расставляем переносы, как innerText
+    parts: List[str] = []
+
+    def walk(node: Any) -> None:
+        if node.text:
+            parts.append(node.text)
+        for child in node:
+            tag = child.tag.lower() if isinstance(child.tag, str) else None
+            block = tag in _BLOCK_TAGS
+            if block:
+                parts.append("\n")
+            if tag is not None and tag not in ("script", "style"):
+                walk(child)
+            if block:
+                parts.append("\n")
+            if child.tail:
+                parts.append(child.tail)
+
+    walk(el)
+    return "".join(parts)
+
+
+def raw_from_html(page_html: Union[str, bytes]) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Те же «сырые» поля, что отдаёт EXTRACT_JS, но из HTML страницы (driver.page_source).
+    None — контейнера отзыва на странице нет.
+    """
+    doc = lxml_html.fromstring(page_html)
+    found = doc.cssselect(SELECTORS["container"])
+    if not found:
+        return None
+    root = found[0]
+
+    def text(key: str) -> Optional[str]:
+        el = root.cssselect(SELECTORS[key])
+        return _inner_text(el[0]) if el else None
+
+    def attr(key: str, name: str) -> Optional[str]:
+        el = root.cssselect(SELECTORS[key])
+        return el[0].get(name) if el else None
+
+    return {
+        "date": attr("date", "content"),
+        "title": text("title"),
+        "plus": text("plus"),
+        "minus": text("minus"),
+        "body": text("body"),
+        "ratingMeta": attr("ratingMeta", "content"),
+        "ratingScore": text("ratingScore"),
+        "location": text("location"),
+    }
+
+
+def build_review(raw: Dict[str, Optional[str]], review_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Сырые значения -> запись отзыва в формате otzovik_detailed_reviews.json."""
+    rid = review_data.get("id")
+    review: Dict[str, Any] = {
+        "id": rid,
+        "link": review_data.get("link"),
+        "date": raw.get("date"),
+        "title": None,
+        "text": None,
+        "rating": raw.get("ratingMeta") or raw.get("ratingScore"),
+        "status": None,   # status/product остаются None (как в JS)
+        "product": None,
+        "city": extract_city(raw.get("location")),
+    }
+
+    if raw.get("title") is not None:
+        # Заголовок (h1) + убрать "Отзыв: "
+        review["title"] = clean_text(re.sub(r"^Отзыв:\s*", "", raw["title"] or ""))
+
+    # Текст: плюс/минус/основной
+    text_parts = [ct for ct in (clean_text(raw.get(k)) for k in ("plus", "minus", "body")) if ct]
+    review["text"] = "\n\n".join(text_parts) if text_parts else None
+
+    if not review["date"]:
+        print(f"   ⚠️  Дата не найдена для отзыва {rid}")
+    if raw.get("title") is None:
+        print(f"   ⚠️  Заголовок не найден для отзыва {rid}")
+    if not review["rating"]:
+        print(f"   ⚠️  Рейтинг не найден для отзыва {rid}")
+    if raw.get("location") is None:
+        print(f"   ⚠️  Город не найден для отзыва {rid}")
+    return review
+
+
+def extract_raw(driver_instance: Any, mode: str) -> Optional[Dict[str, Optional[str]]]:
+    """Все поля открытой страницы за одно обращение к браузеру: mode = "js" | "html"."""
+    if mode == "js":
+        return driver_instance.execute_script(EXTRACT_JS, SELECTORS)
+    return raw_from_html(driver_instance.page_source)
+
+
+def fixture_paths() -> List[str]:
+    return sorted(
+        os.path.join(FIXTURE_DIR, name) for name in os.listdir(FIXTURE_DIR) if name.endswith(".html")
+    )
+
+
+def _headless_chrome() -> Any:
+    """Headless Chrome для режима js или None, если он не запускается."""
+    try:
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
+        options.add_argument("--no-sandbox")
+        return webdriver.Chrome(options=options)
+    except Exception as e:
+        print(f"⚠️  Chrome не запустился, режим js не проверен: {e}")
+        return None
+
+
+def check_fixture(paths: Optional[List[str]] = None) -> None:
+    """
+    Сверка на сохранённых страницах: режим html даёт ту же запись, что лежит
+    в otzovik_detailed_reviews.json, а режим js (если есть Chrome) — те же сырые поля, что html.
+    """
+    paths = paths or fixture_paths()
+    with open(FIXTURE_RECORDS, "r", encoding="utf-8") as f:
+        expected = {r["id"]: r for r in json.load(f)}
+
+    for p in paths:
+        rid = int(re.search(r"review_(\d+)\.html", p).group(1))
+        with open(p, "r", encoding="utf-8") as f:
+            raw = raw_from_html(f.read())   # строка, как driver.page_source
+        assert raw is not None, f"{p}: нет контейнера {SELECTORS['container']}"
+        got = build_review(raw, {"id": rid, "link": expected[rid]["link"]})
+        assert got == expected[rid], f"{p}: запись расходится с эталоном: {got}"
+    print(f"✅ html: страниц — {len(paths)}, записи совпадают с {os.path.basename(FIXTURE_RECORDS)}")
+
+    driver_instance = _headless_chrome()
+    if driver_instance is None:
+        return
+    try:
+        for p in paths:
+            driver_instance.get("file://" + os.path.abspath(p))
+            js, from_html = extract_raw(driver_instance, "js"), extract_raw(driver_instance, "html")
+            assert build_review(js or {}, {}) == build_review(from_html or {}, {}), f"{p}: js и html расходятся"
+        print(f"✅ js: страниц — {len(paths)}, поля совпадают с режимом html")
+    finally:
+        driver_instance.quit()
+
+
+def benchmark(paths: List[str], repeats: int = 20) -> None:
+    """
+    Сравнение режимов на сохранённых страницах отзывов: разбор HTML — всегда,
+    execute_script — если удаётся запустить headless Chrome (страницы открываются как file://).
+    """
+    pages = {p: open(p, "rb").read() for p in paths}
+    for p, data in pages.items():
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            raw_from_html(data)
+        print(f"🐍 html  {p}: {(time.perf_counter() - t0) / repeats * 1000:.2f} мс/страница (только lxml)")
+
+    driver_instance = _headless_chrome()
+    if driver_instance is None:
+        return
+
+    try:
+        for p in paths:
+            driver_instance.get("file://" + os.path.abspath(p))
+            timings = {}
+            results = {}
+            for mode in ("js", "html"):
+                t0 = time.perf_counter()
+                for _ in range(repeats):
+                    results[mode] = extract_raw(driver_instance, mode)
+                timings[mode] = (time.perf_counter() - t0) / repeats * 1000
+            same = build_review(results["js"] or {}, {}) == build_review(results["html"] or {}, {})
+            print(
+                f"⏱️  {p}: js {timings['js']:.2f} мс, html (page_source + lxml) {timings['html']:.2f} мс"
+                f" | результаты {'совпадают' if same else 'РАЗЛИЧАЮТСЯ'}"
+            )
+    finally:
+        driver_instance.quit()
+
+
+if __name__ == "__main__":
+    # сверка с фикстурами: python detail_extract.py --check
+    # замер на фикстурах: python detail_extract.py --bench
+    # замер на своих страницах: python detail_extract.py review_1.html review_2.html ...
+    if sys.argv[1:] == ["--check"]:
+        check_fixture()
+        sys.exit(0)
+    if sys.argv[1:] == ["--bench"]:
+        benchmark(fixture_paths())
+        sys.exit(0)
+    if len(sys.argv) < 2:
+        print("Использование: python detail_extract.py --check | --bench | saved_review.html [...]")
+        sys.exit(1)
+    benchmark(sys.argv[1:])
@@ -1,9 +1,10 @@
 import json
 import os
-import re
 import sys
 import signal
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
 from typing import Any, Dict, List, Optional
 
 from selenium import webdriver
@@ -11,10 +12,29 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from listing_http import (
+    REVIEW_SELECTOR, PageLoadError, fetch_listing, find_window, make_session, page_url, parse_listing_html,
+)
+
+
+# Окно дат отзывов
+DATE_FROM = "2025-01-01"
+DATE_TO = "2026-02-08"
+
+# Страницы листинга: при FIND_WINDOW границы окна дат ищутся бинарным поиском,
+# иначе обходится фиксированный диапазон START_PAGE..END_PAGE
+FIND_WINDOW = True
+START_PAGE = 1
+END_PAGE = 48
+PAGE_WORKERS = 4
+USE_HTTP = True   # False — все страницы через Chrome, как раньше
 
 # Глобальные переменные для graceful shutdown
-driver = None
+pool = None
+session = None   # HTTP-сессия листинга: создаётся в parseOtzovikGazprombank, не при импорте
 allReviews: List[Dict[str, Any]] = []
+pageResults: Dict[int, List[Dict[str, Any]]] = {}
+pageCache: Dict[int, List[Dict[str, Any]]] = {}
 isShuttingDown = False
 
 
@@ -51,6 +71,37 @@ chrome_options.add_argument("--ignore-ssl-errors")
 chrome_options.add_argument("--allow-running-insecure-content")
 
 
+# Свой драйвер на каждый поток пула (создаётся, только если потоку понадобился браузер)
+class DriverPool:
+    def __init__(self) -> None:
+        self.local = threading.local()
+        self.drivers: List[webdriver.Chrome] = []
+        self.lock = threading.Lock()
+
+    def get(self) -> webdriver.Chrome:
+        driver = getattr(self.local, "driver", None)
+        if driver is None:
+            driver = webdriver.Chrome(options=chrome_options)
+            self.local.driver = driver
+            with self.lock:
+                self.drivers.append(driver)
+            print(f"✅ Chrome драйвер #{len(self.drivers)} запущен")
+        return driver
+
+    def close(self) -> None:
+        for driver in self.drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        print(f"🔚 Закрыто браузеров: {len(self.drivers)}")
+
+
+# Отзывы готовых страниц, склеенные в порядке номеров страниц
+def mergePages() -> List[Dict[str, Any]]:
+    return [review for pageNum in sorted(pageResults) for review in pageResults[pageNum]]
+
+
 # Функция для сохранения отзывов в JSON файл
 def saveReviewsToFile(reviews: List[Dict[str, Any]], filename: str = "otzovik_reviews.json") -> None:
     try:
@@ -64,7 +115,7 @@ def saveReviewsToFile(reviews: List[Dict[str, Any]], filename: str = "otzovik_re
 
 # Функция graceful shutdown
 def gracefulShutdown(sig: str) -> None:
-    global isShuttingDown, driver
+    global isShuttingDown
 
     if isShuttingDown:
         print("\n⏳ Уже в процессе завершения работы...")
@@ -80,14 +131,10 @@ def gracefulShutdown(sig: str) -> None:
             saveReviewsToFile(allReviews, "otzovik_reviews_filtered_emergency.json")
             print(f"✅ Данные сохранены! Всего отзывов: {len(allReviews)}")
 
-        # Закрываем браузер
-        if driver is not None:
-            print("🔚 Закрываем браузер...")
-            try:
-                driver.quit()
-            except Exception:
-                pass
-            print("✅ Браузер закрыт")
+        # Закрываем браузеры
+        if pool is not None:
+            print("🔚 Закрываем браузеры...")
+            pool.close()
 
         print("🏁 Graceful shutdown завершен")
         sys.exit(0)
@@ -114,130 +161,93 @@ if hasattr(signal, "SIGHUP"):
 def isDateInRange(dateString: str) -> bool:
     try:
         review_date = datetime.fromisoformat(dateString.replace("Z", "+00:00")).date()
-        start_date = datetime.fromisoformat("2025-01-01").date()
-        end_date = datetime.fromisoformat("2026-02-08").date()
+        start_date = datetime.fromisoformat(DATE_FROM).date()
+        end_date = datetime.fromisoformat(DATE_TO).date()
         return review_date >= start_date and review_date <= end_date
     except Exception:
         print("Ошибка при парсинге даты:", dateString)
         return False
 
 
-# Функция для парсинга одного отзыва
-def parseReview(reviewElement) -> Optional[Dict[str, Any]]:
-    try:
-        # ID из meta[itemprop="url"]
-        metaUrl = reviewElement.find_element(By.CSS_SELECTOR, 'meta[itemprop="url"]')
-        reviewUrl = metaUrl.get_attribute("content")
-
-        # review_9803311.html -> 9803311
-        idMatch = re.search(r"review_(\d+)\.html", reviewUrl or "")
-        if not idMatch:
-            print("Не удалось извлечь ID из URL:", reviewUrl)
-            return None
+# Фильтр по датам для одного отзыва со страницы листинга
+def parseReview(review: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    reviewId = review["id"]
+    reviewDate = review.get("date")
+    if not reviewDate:
+        print(f"Не удалось извлечь дату для отзыва {reviewId}")
+        return None
 
-        reviewId = int(idMatch.group(1))
-        reviewLink = reviewUrl
+    if not isDateInRange(reviewDate):
+        print(f"   📅 Отзыв {reviewId} ({reviewDate}) не в диапазоне дат - пропускаем")
+        return None
 
-        # дата публикации из content
-        reviewDate = None
-        try:
-            dateElement = reviewElement.find_element(By.CSS_SELECTOR, '.review-postdate[itemprop="datePublished"]')
-            reviewDate = dateElement.get_attribute("content")
-        except Exception:
-            print(f"Не удалось извлечь дату для отзыва {reviewId}")
-            return None
+    print(f"   ✅ Отзыв {reviewId} ({reviewDate}) в диапазоне дат - добавляем")
+    return review
 
-        # фильтр по датам
-        if not isDateInRange(reviewDate):
-            print(f"   📅 Отзыв {reviewId} ({reviewDate}) не в диапазоне дат - пропускаем")
-            return None
 
-        print(f"   ✅ Отзыв {reviewId} ({reviewDate}) в диапазоне дат - добавляем")
-        return {"id": reviewId, "link": reviewLink, "date": reviewDate}
+# HTML страницы через браузер — только если по HTTP пришла капча/заглушка
+def fetchPageWithBrowser(pageNum: int) -> Optional[str]:
+    driverInstance = pool.get()
+    driverInstance.get(page_url(pageNum))
 
-    except Exception as error:
-        print("Ошибка при парсинге отзыва:", str(error))
+    print("   ⏳ Ожидаем загрузки отзывов в браузере...")
+    try:
+        WebDriverWait(driverInstance, 15).until(EC.presence_of_element_located((By.CSS_SELECTOR, REVIEW_SELECTOR)))
+    except Exception:
+        print(f"   ⚠️  Отзывы не загрузились на странице {pageNum} (timeout)")
         return None
+    return driverInstance.page_source
 
 
-# Функция для парсинга одной страницы с умным ожиданием
-def parsePage(driverInstance, pageNum: int) -> List[Dict[str, Any]]:
-    try:
+# Отзывы страницы без фильтра по датам: HTTP + lxml, браузер — запасной путь.
+# Страницы кэшируются — поиск окна дат и основной обход не качают их дважды.
+# [] — настоящая страница без отзывов; не загрузилась — PageLoadError.
+def loadPage(pageNum: int) -> List[Dict[str, Any]]:
+    if pageNum in pageCache:
+        return pageCache[pageNum]
+    if isShuttingDown:
+        raise PageLoadError(f"страница {pageNum}: прерывание из-за shutdown")
+
+    url = page_url(pageNum)
+    print(f"📄 Загружаем страницу {pageNum}: {url}")
+
+    found = None
+    if USE_HTTP and session is not None:
+        try:
+            found = fetch_listing(session, url)
+        except Exception as error:
+            print(f"   ⚠️  HTTP-запрос страницы {pageNum} не удался: {str(error)}")
+        if found is None:
+            print(f"   🧩 Страница {pageNum} без отзывов по HTTP (капча?) — открываем в браузере")
+
+    if found is None:
         if isShuttingDown:
-            print("🛑 Прерывание парсинга из-за shutdown")
-            return []
+            raise PageLoadError(f"страница {pageNum}: прерывание из-за shutdown")
+        pageHtml = fetchPageWithBrowser(pageNum)
+        found = parse_listing_html(pageHtml) if pageHtml else None
 
-        url = f"https://otzovik.com/reviews/bank_gazprombank_russia/{pageNum}"
-        print(f"📄 Обрабатываем страницу {pageNum}: {url}")
+    if found is None:
+        raise PageLoadError(f"страница {pageNum} не загрузилась ни по HTTP, ни в браузере")
+    pageCache[pageNum] = found
+    return found
 
-        driverInstance.get(url)
 
-        # Ждем контейнер
-        print("   ⏳ Ожидаем загрузки контейнера с отзывами...")
-        try:
-            WebDriverWait(driverInstance, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, ".review-list-2.review-list-chunk"))
-            )
-            print("   ✅ Контейнер найден")
-        except Exception:
-            print(f"   ⚠️  Контейнер с отзывами не найден на странице {pageNum} (timeout)")
+# Функция для парсинга одной страницы
+def parsePage(pageNum: int) -> List[Dict[str, Any]]:
+    try:
+        if isShuttingDown:
+            print("🛑 Прерывание парсинга из-за shutdown")
             return []
 
-        # Ждем появления хотя бы одного отзыва + "стабилизация DOM"
-        print("   ⏳ Ожидаем загрузки отзывов...")
+        print(f"📄 Обрабатываем страницу {pageNum}")
         try:
-            WebDriverWait(driverInstance, 10).until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, '.review-list-2.review-list-chunk .item[itemprop="review"]')
-                )
-            )
-
-            previousCount = 0
-            stableCount = 0
-            maxStableChecks = 1
-
-            while stableCount < maxStableChecks:
-                currentElements = driverInstance.find_elements(
-                    By.CSS_SELECTOR, '.review-list-2.review-list-chunk .item[itemprop="review"]'
-                )
-                currentCount = len(currentElements)
-
-                if currentCount == previousCount and currentCount > 0:
-                    stableCount += 1
-                    print(f"   � DOM стабилен: {currentCount} отзывов (проверка {stableCount}/{maxStableChecks})")
-                else:
-                    stableCount = 0
-                    print(f"   📊 Загружается: {currentCount} отзывов")
-
-                previousCount = currentCount
-
-                if isShuttingDown:
-                    print("🛑 Прерывание ожидания из-за shutdown")
-                    return []
-
-        except Exception:
-            print(f"   ⚠️  Отзывы не загрузились на странице {pageNum}")
+            found = loadPage(pageNum)
+        except PageLoadError as error:
+            print(f"   ⚠️  {str(error)}")
             return []
 
-        reviewElements = driverInstance.find_elements(
-            By.CSS_SELECTOR, '.review-list-2.review-list-chunk .item[itemprop="review"]'
-        )
-        print(f"   📝 Финальное количество отзывов: {len(reviewElements)}")
-
-        pageReviews: List[Dict[str, Any]] = []
-
-        for i in range(len(reviewElements)):
-            if isShuttingDown:
-                print("🛑 Прерывание парсинга отзывов из-за shutdown")
-                break
-
-            try:
-                review = parseReview(reviewElements[i])
-                if review:
-                    pageReviews.append(review)
-                    print(f"   ✅ Отзыв {review['id']} успешно обработан")
-            except Exception as error:
-                print(f"   ⚠️  Ошибка при обработке отзыва {i + 1}: {str(error)}")
+        print(f"   📝 Отзывов на странице: {len(found)}")
+        pageReviews = [review for review in map(parseReview, found) if review]
 
         print(f"   🎯 Страница {pageNum} завершена: собрано {len(pageReviews)} отзывов")
         return pageReviews
@@ -247,40 +257,62 @@ def parsePage(driverInstance, pageNum: int) -> List[Dict[str, Any]]:
         return []
 
 
+# Страницы для обхода: окно дат ищется по самому листингу или берётся фиксированный диапазон
+def pagesToCrawl() -> List[int]:
+    if not FIND_WINDOW:
+        return list(range(START_PAGE, END_PAGE + 1))
+
+    print(f"🔎 Ищем страницы с отзывами за {DATE_FROM} - {DATE_TO}...")
+    # PageLoadError здесь не глотаем: окно по незагрузившейся странице было бы неверным
+    window = find_window(loadPage, date.fromisoformat(DATE_FROM), date.fromisoformat(DATE_TO))
+    print(f"🔎 Проверено страниц: {len(pageCache)}")
+    if window is None:
+        print("ℹ️ В листинге нет отзывов за этот период")
+        return []
+    first, last = window
+    print(f"✅ Окно дат: страницы {first}..{last}")
+    return list(range(first, last + 1))
+
+
 # Главная функция парсера
 def parseOtzovikGazprombank() -> List[Dict[str, Any]]:
-    global driver
+    global pool, session
 
     try:
         print("🚀 Запуск парсера Otzovik.com для Газпромбанка (отзывы 01.01.2024 - 31.05.2025)...")
         print("💡 Для остановки используйте Ctrl+C (данные будут сохранены)")
 
-        # Создание драйвера Chrome
-        driver = webdriver.Chrome(options=chrome_options)
-        print("✅ Chrome драйвер запущен")
-
-        startPage = 1
-        endPage = 48
-
-        for pageNum in range(startPage, endPage + 1):
-            if isShuttingDown:
-                print("🛑 Прерывание парсинга из-за shutdown")
-                break
-
-            try:
-                pageReviews = parsePage(driver, pageNum)
-                allReviews.extend(pageReviews)
+        pool = DriverPool()
+        if USE_HTTP:
+            session = make_session(PAGE_WORKERS)
+        pages = pagesToCrawl()
+        workers = max(1, min(PAGE_WORKERS, len(pages)))
+        print(f"🧵 Страниц: {len(pages)}, потоков: {workers}")
 
-                print(f"📊 Страница {pageNum}/{endPage} завершена. Всего отзывов: {len(allReviews)}")
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {executor.submit(parsePage, n): n for n in pages}
+
+            # страницы завершаются в любом порядке, но allReviews всегда
+            # собирается по номерам страниц — и для итога, и для аварийного сохранения
+            for future in as_completed(futures):
+                pageNum = futures[future]
+                try:
+                    pageResults[pageNum] = future.result()
+                except Exception as error:
+                    print(f"❌ Критическая ошибка на странице {pageNum}:", str(error))
+                    pageResults[pageNum] = []
+                allReviews[:] = mergePages()
+
+                done = len(pageResults)
+                print(f"📊 Страница {pageNum} завершена ({done}/{len(pages)}). Всего отзывов: {len(allReviews)}")
 
                 # промежуточные результаты каждые 10 страниц
-                if pageNum % 10 == 0:
-                    print(f"💾 Промежуточное сохранение после {pageNum} страниц...")
-                    saveReviewsToFile(allReviews, f"otzovik_reviews_filtered_page_{pageNum}.json")
-
-            except Exception as error:
-                print(f"❌ Критическая ошибка на странице {pageNum}:", str(error))
-                continue
+                if done % 10 == 0:
+                    print(f"💾 Промежуточное сохранение после {done} страниц...")
+                    saveReviewsToFile(allReviews, f"otzovik_reviews_filtered_page_{done}.json")
+        finally:
+            executor.shutdown(wait=not isShuttingDown, cancel_futures=True)
 
         if not isShuttingDown:
             print("\n🎉 Парсинг завершен!")
@@ -293,13 +325,13 @@ def parseOtzovikGazprombank() -> List[Dict[str, Any]]:
         print("❌ Критическая ошибка парсера:", str(error))
         raise
     finally:
-        if driver is not None and not isShuttingDown:
-            print("🔚 Закрытие браузера...")
-            try:
-                driver.quit()
-            except Exception:
-                pass
-            driver = None
+        if session is not None:
+            session.close()
+            session = None
+        if pool is not None and not isShuttingDown:
+            print("🔚 Закрытие браузеров...")
+            pool.close()
+            pool = None
 
 
 # Запуск парсера
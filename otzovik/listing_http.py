@@ -0,0 +1,162 @@
+import os
+import re
+import sys
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from lxml import html as lxml_html
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from page_search import gallop_first
+
+
+# 🔧 настройки HTTP-клиента
+HTTP_TIMEOUT_S = 20
+HTTP_POOL_SIZE = 8
+HTTP_RETRIES = 2
+
+UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+      "AppleWebKit/537.36 (KHTML, like Gecko) "
+      "Chrome/127.0.0.0 Safari/537.36")
+
+LISTING_URL = "https://otzovik.com/reviews/bank_gazprombank_russia/"
+MAX_PAGE = 1000   # предохранитель для галопа
+
+# Листинг отзовика — серверная микроразметка, браузер для неё не нужен
+CONTAINER_SELECTOR = ".review-list-2.review-list-chunk"
+REVIEW_SELECTOR = f'{CONTAINER_SELECTOR} .item[itemprop="review"]'
+
+
+class PageLoadError(RuntimeError):
+    """Страница листинга не загрузилась ни по HTTP, ни в браузере."""
+
+
+def page_url(page_num: int, base_url: str = LISTING_URL) -> str:
+    return f"{base_url}{page_num}"
+
+
+def make_session(pool_size: int = HTTP_POOL_SIZE) -> requests.Session:
+    """
+    Одна сессия на весь прогон: keep-alive соединения переиспользуются
+    между запросами (и между потоками, до pool_size штук).
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=HTTP_RETRIES)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": UA,
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "ru-RU,ru;q=0.9,en;q=0.8",
+    })
+    return session
+
+
+def fetch_listing(session: requests.Session, url: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Отзывы страницы по HTTP. [] — страницы нет (404, конец листинга);
+    None — капча/заглушка/ошибка, страницу нужно открыть в браузере.
+    """
+    resp = session.get(url, timeout=HTTP_TIMEOUT_S)
+    if resp.status_code == 404:
+        return []
+    if resp.status_code != 200:
+        return None
+    # отзовик отдаёт windows-1251 — берём кодировку из заголовка или из <meta>
+    if not resp.encoding or resp.encoding.lower() == "iso-8859-1":
+        resp.encoding = resp.apparent_encoding or "utf-8"
+    return parse_listing_html(resp.text)
+
+
+def parse_listing_html(page_html: Union[str, bytes]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Отзывы страницы листинга за один проход lxml: [{"id", "link", "date"}].
+    None — контейнера с отзывами в HTML нет (капча/заглушка), страницу
+    нужно открыть в браузере.
+    """
+    doc = lxml_html.fromstring(page_html)
+    if not doc.cssselect(CONTAINER_SELECTOR):
+        return None
+
+    reviews: List[Dict[str, Any]] = []
+    for item in doc.cssselect(REVIEW_SELECTOR):
+        meta_url = item.cssselect('meta[itemprop="url"]')
+        link = meta_url[0].get("content") if meta_url else None
+
+        # review_9803311.html -> 9803311
+        m = re.search(r"review_(\d+)\.html", link or "")
+        if not m:
+            print("Не удалось извлечь ID из URL:", link)
+            continue
+
+        date_el = item.cssselect('.review-postdate[itemprop="datePublished"]')
+        reviews.append({
+            "id": int(m.group(1)),
+            "link": link,
+            "date": date_el[0].get("content") if date_el else None,
+        })
+
+    return reviews
+
+
+def _date(value: Optional[str]) -> Optional[date]:
+    try:
+        return datetime.fromisoformat((value or "").replace("Z", "+00:00")).date()
+    except ValueError:
+        return None
+
+
+def page_dates(reviews: Optional[List[Dict[str, Any]]]) -> Tuple[Optional[date], Optional[date]]:
+    """(самая новая, самая старая) дата на странице; (None, None) — отзывов на странице нет."""
+    ds = [d for d in (_date(r.get("date")) for r in reviews or []) if d]
+    if not ds:
+        return None, None
+    return max(ds), min(ds)
+
+
+def find_window(
+    load: Callable[[int], List[Dict[str, Any]]],
+    date_from: date,
+    date_to: date,
+) -> Optional[Tuple[int, int]]:
+    """
+    Первая и последняя страницы листинга, пересекающиеся с [date_from, date_to].
+    Листинг отсортирован от новых к старым, поэтому оба края — монотонные
+    предикаты; load(p) должен кэшировать страницы, чтобы не качать их дважды.
+    Конец листинга — только настоящая страница без отзывов ([]); если страница
+    не загрузилась, load(p) бросает PageLoadError, и поиск прерывается, а не
+    сдвигает окно.
+    """
+    def reached_window(p: int) -> bool:
+        # страница уже не новее date_to (или листинг кончился)
+        newest, oldest = page_dates(load(p))
+        return oldest is None or oldest <= date_to
+
+    def past_window(p: int) -> bool:
+        # страница целиком старше date_from (или листинг кончился)
+        newest, oldest = page_dates(load(p))
+        return newest is None or newest < date_from
+
+    first = gallop_first(reached_window, max_page=MAX_PAGE)
+    if past_window(first):
+        return None
+    last = gallop_first(past_window, start=first, max_page=MAX_PAGE) - 1
+    return first, last
+
+
+if __name__ == "__main__":
+    # проверка на сохранённой странице: python listing_http.py page.html
+    if len(sys.argv) < 2:
+        print("Использование: python listing_http.py page.html")
+        sys.exit(1)
+    path = sys.argv[1]
+    with open(path, "rb") as f:
+        found = parse_listing_html(f.read())   # байты: lxml сам возьмёт кодировку из <meta charset>
+    if found is None:
+        print(f"⚠️  В {path} нет контейнера {CONTAINER_SELECTOR} — это не страница листинга отзовика")
+    else:
+        print(f"📋 Отзывов на странице: {len(found)}")
+        for review in found:
+            print(f"  {review['id']} | {review['date']} | {review['link']}")
@@ -1,26 +1,45 @@
 # -*- coding: utf-8 -*-
 
 import json
+import multiprocessing as mp
 import os
+import queue
 import re
 import signal
 import sys
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from detail_extract import SELECTORS, build_review, extract_raw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from review_store import ReviewStore
+
 
 # -----------------------------
 # Глобальные переменные
 # -----------------------------
 driver: Optional[webdriver.Chrome] = None
 all_reviews: List[Dict[str, Any]] = []
+results: Dict[int, Dict[str, Any]] = {}  # позиция в исходном списке -> детальный отзыв
 is_shutting_down: bool = False
 processed_count: int = 0
+workers: List[Any] = []
+stop_event: Any = None
+
+SOURCE = "otzovik"  # ключ источника в общей базе review_store
+EXTRACT_MODE = "js"  # "js" — один execute_script на страницу, "html" — разбор driver.page_source через lxml
+# html сам по себе ~0.6 мс/страница (lxml), но добавляет передачу всего page_source из браузера;
+# js возвращает только 8 полей. Сверка и замер: python detail_extract.py --check / --bench
+SHARD_WORKERS = 4    # процессов, у каждого свой Chrome и своя часть списка; 1 — всё в одном процессе
+PAUSE_S = 0.5        # пауза между отзывами в каждом драйвере
+WORKER_STOP_TIMEOUT_S = 30
 
 
 # -----------------------------
@@ -154,37 +173,31 @@ def load_source_reviews(filename: str = "otzovik_reviews_filtered_2024-2025.json
         raise
 
 
-def filter_source_reviews_from_id(source_reviews: List[Dict[str, Any]], last_processed_id: Optional[str]) -> List[Dict[str, Any]]:
-    if not last_processed_id:
-        return source_reviews
-
-    last_index = next((i for i, r in enumerate(source_reviews) if r.get("id") == last_processed_id), -1)
-    if last_index == -1:
-        print(f"⚠️  Последний обработанный ID {last_processed_id} не найден в исходных данных")
-        return source_reviews
-
-    remaining = source_reviews[last_index + 1 :]
-    print(f"➡️  Продолжаем с позиции {last_index + 1}, осталось обработать: {len(remaining)} отзывов")
+def filter_unprocessed(
+    source_reviews: List[Dict[str, Any]], existing_reviews: List[Dict[str, Any]]
+) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    (позиция, отзыв) для ещё не обработанных отзывов. Сравнение по множеству ID,
+    а не по последнему ID: воркеры завершают отзывы не по порядку.
+    """
+    done_ids = {r.get("id") for r in existing_reviews}
+    remaining = [(i, r) for i, r in enumerate(source_reviews) if r.get("id") not in done_ids]
+    if existing_reviews:
+        print(f"➡️  Уже обработано {len(source_reviews) - len(remaining)}, осталось обработать: {len(remaining)} отзывов")
     return remaining
 
 
-# -----------------------------
-# Text helpers
-# -----------------------------
-def clean_text(text: Optional[str]) -> Optional[str]:
-    if not text:
-        return None
-    t = re.sub(r"\s+", " ", text).strip()
-    return t or None
+def seed_results(source_reviews: List[Dict[str, Any]], existing_reviews: List[Dict[str, Any]]) -> None:
+    # ранее сохранённые отзывы встают на свои позиции исходного списка
+    pos = {r.get("id"): i for i, r in enumerate(source_reviews)}
+    for k, r in enumerate(existing_reviews):
+        results[pos.get(r.get("id"), k - len(existing_reviews))] = r
 
 
-def extract_city(location_text: Optional[str]) -> Optional[str]:
-    if not location_text:
-        return None
-    m = re.search(r"(?:Россия,\s*)?(.+?)$", location_text)
-    if m and m.group(1):
-        return clean_text(m.group(1).upper())
-    return None
+def ordered_reviews() -> List[Dict[str, Any]]:
+    """Все готовые отзывы в порядке исходного списка (для любых сохранений)."""
+    all_reviews[:] = [results[i] for i in sorted(results)]
+    return all_reviews
 
 
 # -----------------------------
@@ -200,101 +213,19 @@ def parse_detailed_review(driver_instance: webdriver.Chrome, review_data: Dict[s
 
         # Ждем загрузки основного контейнера отзыва
         try:
-            review_container = WebDriverWait(driver_instance, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, '.review-contents[itemprop="review"]'))
+            WebDriverWait(driver_instance, 15).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, SELECTORS["container"]))
             )
         except Exception:
             print(f"   ⚠️  Контейнер отзыва не найден для ID {rid}")
             return None
 
-        review: Dict[str, Any] = {
-            "id": rid,
-            "link": link,
-            "date": None,
-            "title": None,
-            "text": None,
-            "rating": None,
-            "status": None,
-            "product": None,
-            "city": None,
-        }
-
-        # Дата
-        try:
-            date_el = review_container.find_element(By.CSS_SELECTOR, 'meta[itemprop="datePublished"]')
-            review["date"] = date_el.get_attribute("content")
-        except Exception:
-            print(f"   ⚠️  Дата не найдена для отзыва {rid}")
-
-        # Заголовок (h1) + убрать "Отзыв: "
-        try:
-            title_el = review_container.find_element(By.CSS_SELECTOR, "h1")
-            title_text = title_el.text
-            review["title"] = clean_text(re.sub(r"^Отзыв:\s*", "", title_text))
-        except Exception:
-            print(f"   ⚠️  Заголовок не найден для отзыва {rid}")
-
-        # Текст: плюс/минус/основной
-        try:
-            text_parts: List[str] = []
-
-            try:
-                plus_el = review_container.find_element(By.CSS_SELECTOR, ".review-plus")
-                plus_text = plus_el.text
-                if plus_text:
-                    ct = clean_text(plus_text)
-                    if ct:
-                        text_parts.append(ct)
-            except Exception:
-                pass
-
-            try:
-                minus_el = review_container.find_element(By.CSS_SELECTOR, ".review-minus")
-                minus_text = minus_el.text
-                if minus_text:
-                    ct = clean_text(minus_text)
-                    if ct:
-                        text_parts.append(ct)
-            except Exception:
-                pass
-
-            try:
-                body_el = review_container.find_element(
-                    By.CSS_SELECTOR, '.review-body.description[itemprop="description"]'
-                )
-                body_text = body_el.text
-                if body_text:
-                    ct = clean_text(body_text)
-                    if ct:
-                        text_parts.append(ct)
-            except Exception:
-                pass
-
-            review["text"] = "\n\n".join(text_parts) if text_parts else None
-        except Exception:
-            print(f"   ⚠️  Текст отзыва не найден для ID {rid}")
-
-        # Рейтинг
-        try:
-            rating_el = review_container.find_element(By.CSS_SELECTOR, 'meta[itemprop="ratingValue"]')
-            review["rating"] = rating_el.get_attribute("content")
-        except Exception:
-            try:
-                rating_span = review_container.find_element(By.CSS_SELECTOR, ".rating-score span")
-                review["rating"] = rating_span.text
-            except Exception:
-                print(f"   ⚠️  Рейтинг не найден для отзыва {rid}")
-
-        # Город
-        try:
-            loc_el = review_container.find_element(By.CSS_SELECTOR, ".user-location")
-            review["city"] = extract_city(loc_el.text)
-        except Exception:
-            print(f"   ⚠️  Город не найден для отзыва {rid}")
-
-        # status/product остаются None (как в JS)
-        review["status"] = None
-        review["product"] = None
+        # Все поля — за одно обращение к браузеру (execute_script или page_source)
+        raw = extract_raw(driver_instance, EXTRACT_MODE)
+        if raw is None:
+            print(f"   ⚠️  Контейнер отзыва не найден для ID {rid}")
+            return None
+        review = build_review(raw, review_data)
 
         print(f"   ✅ Отзыв {rid} успешно обработан")
         return review
@@ -305,11 +236,95 @@ def parse_detailed_review(driver_instance: webdriver.Chrome, review_data: Dict[s
         return None
 
 
+# -----------------------------
+# Sharded crawl
+# -----------------------------
+def shard_worker(shard_no: int, items: List[Tuple[int, Dict[str, Any]]], out_q: Any, stop: Any) -> None:
+    """Процесс-воркер: свой Chrome, своя часть списка, результаты — в общую очередь."""
+    # Ctrl+C получает вся группа процессов — останавливает воркеров главный процесс через stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    driver_instance = None
+    try:
+        driver_instance = webdriver.Chrome(options=build_chrome_options())
+        print(f"✅ [воркер {shard_no}] Chrome драйвер запущен, отзывов: {len(items)}")
+        for idx, review_data in items:
+            if stop.is_set():
+                break
+            out_q.put((idx, parse_detailed_review(driver_instance, review_data)))
+            time.sleep(PAUSE_S)
+    except Exception as e:
+        print(f"❌ [воркер {shard_no}] Критическая ошибка: {e}")
+    finally:
+        if driver_instance is not None:
+            try:
+                driver_instance.quit()
+            except Exception:
+                pass
+        if stop.is_set():
+            # главный процесс уже сохранил данные и очередь не читает — не ждём её на выходе
+            out_q.cancel_join_thread()
+        out_q.put((None, shard_no))
+
+
+def crawl_sharded(todo: List[Tuple[int, Dict[str, Any]]], n: int) -> Iterator[Tuple[int, Optional[Dict[str, Any]]]]:
+    """(позиция, отзыв) по мере готовности из n процессов; отзывы делятся через шаг n."""
+    global workers, stop_event
+
+    ctx = mp.get_context("spawn")
+    stop_event = ctx.Event()
+    out_q = ctx.Queue()
+    workers = [
+        ctx.Process(target=shard_worker, args=(k + 1, todo[k::n], out_q, stop_event), name=f"shard-{k + 1}")
+        for k in range(n)
+    ]
+    for p in workers:
+        p.start()
+    print(f"🧵 Запущено воркеров: {n}")
+
+    running = n
+    while running:
+        try:
+            idx, payload = out_q.get(timeout=1)
+        except queue.Empty:
+            if not any(p.is_alive() for p in workers):
+                break  # воркеры завершились, не оставив маркера (упали)
+            continue
+        if idx is None:
+            running -= 1
+            continue
+        yield idx, payload
+
+    for p in workers:
+        p.join()
+
+
+def crawl_sequential(todo: List[Tuple[int, Dict[str, Any]]]) -> Iterator[Tuple[int, Optional[Dict[str, Any]]]]:
+    global driver
+
+    driver = webdriver.Chrome(options=build_chrome_options())
+    print("✅ Chrome драйвер запущен")
+    for idx, review_data in todo:
+        if is_shutting_down:
+            print("🛑 Прерывание парсинга из-за shutdown")
+            break
+        yield idx, parse_detailed_review(driver, review_data)
+        time.sleep(PAUSE_S)
+
+
+def stop_workers() -> None:
+    if stop_event is not None:
+        stop_event.set()
+    for p in workers:
+        p.join(timeout=WORKER_STOP_TIMEOUT_S)
+        if p.is_alive():
+            p.terminate()
+
+
 # -----------------------------
 # Graceful shutdown
 # -----------------------------
 def graceful_shutdown(sig_name: str) -> None:
-    global is_shutting_down, driver, all_reviews
+    global is_shutting_down, driver
 
     if is_shutting_down:
         print("\n⏳ Уже в процессе завершения работы...")
@@ -319,11 +334,15 @@ def graceful_shutdown(sig_name: str) -> None:
     print(f"\n🛑 Получен сигнал {sig_name}. Начинаем graceful shutdown...")
 
     try:
-        if len(all_reviews) > 0:
+        if len(results) > 0:
             print("💾 Сохраняем собранные данные...")
-            save_reviews_to_file(all_reviews, "otzovik_detailed_reviews_emergency.json")
+            save_reviews_to_file(ordered_reviews(), "otzovik_detailed_reviews_emergency.json")
             print(f"✅ Данные сохранены! Всего отзывов: {len(all_reviews)}")
 
+        if workers:
+            print("🔚 Останавливаем воркеров...")
+            stop_workers()
+
         if driver is not None:
             print("🔚 Закрываем браузер...")
             try:
@@ -367,7 +386,9 @@ def install_signal_handlers() -> None:
 # Main parser
 # -----------------------------
 def parse_detailed_reviews(source_filename: str = "otzovik_reviews_filtered_2024-2025.json") -> List[Dict[str, Any]]:
-    global driver, all_reviews, processed_count, is_shutting_down
+    global driver, processed_count
+
+    store = ReviewStore()
 
     try:
         print("🚀 Запуск парсера детальной информации отзывов Otzovik...")
@@ -375,59 +396,50 @@ def parse_detailed_reviews(source_filename: str = "otzovik_reviews_filtered_2024
 
         # resume
         last_id, existing_reviews, existing_file = find_last_processed_id()
-        all_reviews.extend(existing_reviews)
 
         all_source_reviews = load_source_reviews(source_filename)
-        source_reviews = filter_source_reviews_from_id(all_source_reviews, last_id)
+        seed_results(all_source_reviews, existing_reviews)
+        todo = filter_unprocessed(all_source_reviews, existing_reviews)
 
-        if len(source_reviews) == 0:
+        if len(todo) == 0:
             print("✅ Все отзывы уже обработаны!")
-            return all_reviews
+            return ordered_reviews()
 
-        # driver
-        options = build_chrome_options()
-        driver = webdriver.Chrome(options=options)
-        print("✅ Chrome драйвер запущен")
-
-        total_reviews = len(source_reviews)
-        already_processed = len(all_reviews)
+        total_reviews = len(todo)
+        already_processed = len(results)
 
         print(f"📊 Уже обработано: {already_processed} отзывов")
         print(f"📊 Осталось обработать: {total_reviews} отзывов")
         pct = (already_processed / len(all_source_reviews) * 100) if all_source_reviews else 0
         print(f"📊 Общий прогресс: {already_processed}/{len(all_source_reviews)} ({pct:.1f}%)")
 
-        for i, review_data in enumerate(source_reviews):
-            if is_shutting_down:
-                print("🛑 Прерывание парсинга из-за shutdown")
-                break
+        n = max(1, min(SHARD_WORKERS, total_reviews))
+        crawl = crawl_sharded(todo, n) if n > 1 else crawl_sequential(todo)
 
+        # результаты приходят в порядке готовности; в базу пишет только этот процесс,
+        # а файлы всегда собираются в порядке исходного списка
+        for i, (idx, detailed) in enumerate(crawl):
             processed_count = already_processed + i + 1
             current_in_batch = i + 1
 
-            rid = review_data.get("id")
+            rid = all_source_reviews[idx].get("id")
             print(
-                f"\n📄 Обрабатываем отзыв {current_in_batch}/{total_reviews} | "
+                f"\n📄 Готов отзыв {current_in_batch}/{total_reviews} | "
                 f"Общий: {processed_count}/{len(all_source_reviews)} (ID: {rid})"
             )
 
             try:
-                detailed = parse_detailed_review(driver, review_data)
-
                 if detailed:
-                    all_reviews.append(detailed)
-                    print(f"   📊 Успешно: {len(all_reviews)} | В батче: {current_in_batch}/{total_reviews}")
+                    results[idx] = detailed
+                    store.upsert(SOURCE, detailed)
+                    print(f"   📊 Успешно: {len(results)} | В батче: {current_in_batch}/{total_reviews}")
                 else:
                     print(f"   ⚠️  Отзыв {rid} пропущен из-за ошибок")
 
                 # промежуточное сохранение каждые 50
                 if processed_count % 50 == 0:
                     print(f"\n💾 Промежуточное сохранение после {processed_count} отзывов...")
-                    save_reviews_to_file(all_reviews, f"otzovik_detailed_reviews_{processed_count}.json")
-
-                # пауза 500ms
-                driver.implicitly_wait(0)  # не обязательно, но чтобы не путать с ожиданиями
-                driver.sleep(0.5)  # type: ignore[attr-defined]  # selenium has sleep on driver in JS; in py it's not standard
+                    save_reviews_to_file(ordered_reviews(), f"otzovik_detailed_reviews_{processed_count}.json")
 
             except Exception as e:
                 print(f"❌ Критическая ошибка при обработке отзыва {rid}: {e}")
@@ -435,10 +447,10 @@ def parse_detailed_reviews(source_filename: str = "otzovik_reviews_filtered_2024
 
         if not is_shutting_down:
             print("\n🎉 Парсинг детальной информации завершен!")
-            print(f"📊 Общее количество успешно обработанных отзывов: {len(all_reviews)}")
+            print(f"📊 Общее количество успешно обработанных отзывов: {len(results)}")
             print(f"📊 Общее количество просмотренных отзывов: {processed_count}")
 
-            save_reviews_to_file(all_reviews)
+            save_reviews_to_file(ordered_reviews())
 
         return all_reviews
 
@@ -446,6 +458,9 @@ def parse_detailed_reviews(source_filename: str = "otzovik_reviews_filtered_2024
         print(f"❌ Критическая ошибка парсера: {e}")
         raise
     finally:
+        store.close()
+        if not is_shutting_down:
+            stop_workers()
         if driver is not None and not is_shutting_down:
             print("🔚 Закрытие браузера...")
             try:
@@ -0,0 +1,28 @@
+from typing import Callable
+
+
+def gallop_first(pred: Callable[[int], bool], start: int = 1, max_page: int = 100_000) -> int:
+    """
+    Наименьшее p >= start, для которого монотонный pred(p) истинен:
+    сначала шаги 1, 2, 4, 8… до первого True, потом бинарный поиск.
+    Общая для листингов banki_ru и otzovik; max_page — предохранитель галопа.
+    """
+    if pred(start):
+        return start
+    lo, step = start, 1
+    hi = start + step
+    while not pred(hi):
+        if hi >= max_page:
+            return max_page
+        lo = hi
+        step *= 2
+        hi = min(start + step, max_page)
+
+    # pred(lo) == False, pred(hi) == True
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if pred(mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi
@@ -0,0 +1,147 @@
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+
+
+# Общая база для всех парсеров (banki_ru, otzovik, sravni_ru) — в корне репозитория,
+# независимо от того, из какой папки запущен скрипт
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reviews.sqlite")
+
+# Поля, вынесенные в колонки (по ним строятся индексы); вся запись целиком лежит в data
+COLUMNS = ("link", "date", "title", "text", "rating", "city", "product", "status")
+
+
+class ReviewStore:
+    """
+    Локальное хранилище отзывов с ключом (source, review_id).
+    upsert не затирает уже известные поля пустыми значениями, поэтому
+    листинг, детальный парсинг и обогащение могут писать в одну запись.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH) -> None:
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reviews (
+                source    TEXT NOT NULL,
+                review_id TEXT NOT NULL,
+                seq       INTEGER NOT NULL,
+                link      TEXT,
+                date      TEXT,
+                title     TEXT,
+                text      TEXT,
+                rating    TEXT,
+                city      TEXT,
+                product   TEXT,
+                status    TEXT,
+                data      TEXT NOT NULL,
+                PRIMARY KEY (source, review_id)
+            )
+            """
+        )
+        for col in ("seq", "date", "rating", "city", "product"):
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS reviews_{col} ON reviews(source, {col})")
+        self.conn.commit()
+
+    # -----------------------------
+    # Запись
+    # -----------------------------
+    def _upsert(self, source: str, review: Dict[str, Any]) -> None:
+        review_id = str(review["id"])
+
+        # слияние с уже сохранённой записью: None не затирает известное значение
+        old = self.conn.execute(
+            "SELECT data FROM reviews WHERE source = ? AND review_id = ?", (source, review_id)
+        ).fetchone()
+        data: Dict[str, Any] = json.loads(old[0]) if old else {}
+        for k, v in review.items():
+            if v is not None or k not in data:
+                data[k] = v
+
+        row = {col: data.get(col) for col in COLUMNS}
+        if row["text"] is None:
+            row["text"] = data.get("content")  # sravni_ru хранит заголовок+текст в content
+        if row["date"] is not None:
+            row["date"] = str(row["date"])[:10]  # YYYY-MM-DD, как бы ни была записана дата
+        if row["rating"] is not None:
+            row["rating"] = str(row["rating"])
+
+        self.conn.execute(
+            f"""
+            INSERT INTO reviews (source, review_id, seq, {", ".join(COLUMNS)}, data)
+            VALUES (?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM reviews WHERE source = ?),
+                    {", ".join("?" for _ in COLUMNS)}, ?)
+            ON CONFLICT (source, review_id) DO UPDATE SET
+                {", ".join(f"{c} = excluded.{c}" for c in COLUMNS)},
+                data = excluded.data
+            """,
+            (source, review_id, source, *(row[c] for c in COLUMNS),
+             json.dumps(data, ensure_ascii=False)),
+        )
+
+    def upsert(self, source: str, review: Dict[str, Any]) -> None:
+        with self.conn:
+            self._upsert(source, review)
+
+    def upsert_many(self, source: str, reviews: Iterable[Dict[str, Any]]) -> int:
+        n = 0
+        with self.conn:
+            for review in reviews:
+                if isinstance(review, dict) and review.get("id") is not None:
+                    self._upsert(source, review)
+                    n += 1
+        return n
+
+    # -----------------------------
+    # Чтение
+    # -----------------------------
+    def has(self, source: str, review_id: Any) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM reviews WHERE source = ? AND review_id = ?", (source, str(review_id))
+        ).fetchone() is not None
+
+    def ids(self, source: str) -> Set[str]:
+        return {rid for (rid,) in self.conn.execute("SELECT review_id FROM reviews WHERE source = ?", (source,))}
+
+    def _where(self, source: str, date_from: Optional[str], date_to: Optional[str]):
+        sql = "source = ?"
+        args: list = [source]
+        if date_from:
+            sql += " AND date >= ?"
+            args.append(str(date_from))
+        if date_to:
+            sql += " AND date <= ?"
+            args.append(str(date_to))
+        return sql, args
+
+    def count(self, source: str, date_from: Optional[str] = None, date_to: Optional[str] = None) -> int:
+        where, args = self._where(source, date_from, date_to)
+        return self.conn.execute(f"SELECT COUNT(*) FROM reviews WHERE {where}", args).fetchone()[0]
+
+    def iter_reviews(
+        self, source: str, date_from: Optional[str] = None, date_to: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        where, args = self._where(source, date_from, date_to)
+        for (data,) in self.conn.execute(f"SELECT data FROM reviews WHERE {where} ORDER BY seq", args):
+            yield json.loads(data)
+
+    def export_json(self, source: str, path: str) -> int:
+        """JSON-массив записей источника, потоково (без сборки списка в памяти)."""
+        tmp = path + ".tmp"
+        n = 0
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("[")
+            for review in self.iter_reviews(source):
+                f.write(",\n  " if n else "\n  ")
+                f.write(json.dumps(review, ensure_ascii=False))
+                n += 1
+            f.write("\n]" if n else "]")
+        os.replace(tmp, path)
+        return n
+
+    def close(self) -> None:
+        self.conn.close()
@@ -1,29 +1,59 @@
-import json
+import sys
 from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator
 
-# Читаем файл reviews.json
-with open("reviews.json", "r", encoding="utf-8") as f:
-    reviews = json.load(f)
+from record_stream import iter_records
+
+INPUT_FILE = "reviews.json"   # JSON-массив или JSONL
 
 # Определяем временной промежуток
-start_date = datetime.fromisoformat("2024-01-01")
-end_date = datetime.fromisoformat("2025-05-31")
+START_DATE = "2024-01-01"
+END_DATE = "2025-05-31"
+
+
+class DateWindowCounter:
+    """
+    Считает записи в окне дат на лету. tap() пропускает записи дальше без
+    изменений — так подсчёт встраивается в любой другой проход по данным.
+    """
+
+    def __init__(self, start: str = START_DATE, end: str = END_DATE) -> None:
+        self.start_date = datetime.fromisoformat(start)
+        self.end_date = datetime.fromisoformat(end)
+        self.total = 0
+        self.count = 0
+
+    def add(self, review: Dict[str, Any]) -> None:
+        self.total += 1
+        try:
+            review_date = datetime.fromisoformat(review.get("date"))
+        except Exception:
+            # аналог Invalid Date в JS → просто не считаем
+            return
+        if self.start_date <= review_date <= self.end_date:
+            self.count += 1
+
+    def tap(self, records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for review in records:
+            self.add(review)
+            yield review
 
-count = 0
-total_reviews = len(reviews)
+    def report(self) -> None:
+        start = self.start_date.strftime("%d.%m.%Y")
+        end = self.end_date.strftime("%d.%m.%Y")
+        print(f"Всего отзывов в файле: {self.total}")
+        print(f"Отзывов в промежутке {start} - {end}: {self.count}")
+        percent = (self.count / self.total * 100) if self.total else 0
+        print(f"Процент от общего количества: {percent:.2f}%")
 
-for review in reviews:
-    try:
-        review_date = datetime.fromisoformat(review.get("date"))
-    except Exception:
-        # аналог Invalid Date в JS → просто не считаем
-        continue
 
-    if start_date <= review_date <= end_date:
-        count += 1
+def main() -> None:
+    path = sys.argv[1] if len(sys.argv) > 1 else INPUT_FILE
+    counter = DateWindowCounter()
+    for review in iter_records(path):
+        counter.add(review)
+    counter.report()
 
-print(f"Всего отзывов в файле: {total_reviews}")
-print(f"Отзывов в промежутке 01.01.2024 - 31.05.2025: {count}")
 
-percent = (count / total_reviews * 100) if total_reviews else 0
-print(f"Процент от общего количества: {percent:.2f}%")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import html
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+
+# Страница sravni.ru — Next.js: всё, что рендерится в карточках, уже лежит
+# JSON-ом в <script id="__NEXT_DATA__"> (первая порция), а следующие порции
+# приходят XHR-ответами с тем же форматом элементов.
+NEXT_DATA_RE = re.compile(r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+
+# Даты в состоянии — UTC, на сайте показываются по Москве
+MSK = timezone(timedelta(hours=3))
+
+BASE_URL = "https://www.sravni.ru"
+OBJECT_PATHS = {"banks": "bank"}
+
+# Сохранённая страница листинга Газпромбанка и отзывы, которые в ней должны найтись
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "otzovik", "debug.html")
+FIXTURE_IDS = [
+    "1078444", "1077457", "1077314", "1076519", "1073566",
+    "1072948", "1069846", "1067115", "1064797", "1061973",
+]
+
+
+def next_data(page_source: str) -> Optional[Dict[str, Any]]:
+    """JSON из __NEXT_DATA__ или None, если его в странице нет."""
+    m = NEXT_DATA_RE.search(page_source or "")
+    if not m:
+        return None
+    try:
+        return json.loads(m.group(1))
+    except ValueError:
+        return None
+
+
+def _is_review_item(x: Any) -> bool:
+    return (
+        isinstance(x, dict)
+        and x.get("id") is not None
+        and "date" in x
+        and "rating" in x
+        and ("text" in x or "html" in x)
+    )
+
+
+def find_review_items(obj: Any) -> List[Dict[str, Any]]:
+    """
+    Все элементы-отзывы из произвольного JSON (состояние страницы или XHR-ответ):
+    ищутся списки объектов с id, date, rating и text — без привязки к пути.
+    """
+    found: List[Dict[str, Any]] = []
+    stack = [obj]
+    while stack:
+        x = stack.pop()
+        if isinstance(x, list):
+            if x and all(_is_review_item(i) for i in x):
+                found.extend(x)
+                continue
+            stack.extend(reversed(x))
+        elif isinstance(x, dict):
+            stack.extend(reversed(list(x.values())))
+    return found
+
+
+def html_to_text(s: str) -> str:
+    """HTML отзыва -> текст с переносами строк, как innerText карточки."""
+    s = re.sub(r"(?i)<br\s*/?>", "\n", s or "")
+    s = re.sub(r"(?i)</p\s*>", "\n", s)
+    s = re.sub(r"<[^>]+>", "", s)
+    s = html.unescape(s).replace("\xa0", " ")
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in s.split("\n")]
+    return "\n".join(line for line in lines if line)
+
+
+def iso_date_msk(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return value[:10]
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(MSK)
+    return dt.strftime("%Y-%m-%d")
+
+
+def item_to_review(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Элемент состояния -> запись в том же виде, что собирает DOM-парсер index.py."""
+    review_id = str(item["id"])
+    path = OBJECT_PATHS.get(item.get("reviewObjectType") or "", "bank")
+    alias = item.get("alias") or "gazprombank"
+
+    title = html_to_text(item.get("title") or "")
+    text = html_to_text(item.get("text") or item.get("html") or "")
+    content = f"{title}\n\n{text}" if (title and text) else (title or text)
+
+    return {
+        "id": review_id,
+        "link": f"{BASE_URL}/{path}/{alias}/otzyvy/{review_id}/",
+        "date": iso_date_msk(item.get("date")),
+        "rating": item.get("rating"),
+        "content": content.strip(),
+    }
+
+
+def reviews_from_json(obj: Any) -> Dict[str, Dict[str, Any]]:
+    """{id: запись} по всем отзывам, найденным в JSON."""
+    out: Dict[str, Dict[str, Any]] = {}
+    for item in find_review_items(obj):
+        review = item_to_review(item)
+        out[review["id"]] = review
+    return out
+
+
+def reviews_from_page_source(page_source: str) -> Dict[str, Dict[str, Any]]:
+    state = next_data(page_source)
+    return reviews_from_json(state) if state else {}
+
+
+def check_fixture(path: str = FIXTURE_PATH) -> None:
+    """Сверка разбора с сохранённой страницей: число отзывов, их ID и ссылки."""
+    with open(path, "r", encoding="utf-8") as f:
+        found = reviews_from_page_source(f.read())
+    assert len(found) == len(FIXTURE_IDS), f"ожидалось {len(FIXTURE_IDS)} отзывов, найдено {len(found)}"
+    assert list(found) == FIXTURE_IDS, f"ID не совпадают: {list(found)}"
+    for review_id, review in found.items():
+        expected = f"{BASE_URL}/bank/gazprombank/otzyvy/{review_id}/"
+        assert review["link"] == expected, f"ссылка {review['link']} вместо {expected}"
+    print(f"✅ Фикстура {path}: {len(found)} отзывов, ID и ссылки совпадают")
+
+
+if __name__ == "__main__":
+    # сверка с фикстурой: python embedded_state.py --check
+    # проверка на сохранённой странице: python embedded_state.py ../otzovik/debug.html
+    if sys.argv[1:] == ["--check"]:
+        check_fixture()
+        sys.exit(0)
+    path = sys.argv[1] if len(sys.argv) > 1 else "debug.html"
+    with open(path, "r", encoding="utf-8") as f:
+        found = reviews_from_page_source(f.read())
+    print(f"📋 Отзывов в состоянии страницы: {len(found)}")
+    for review in found.values():
+        print(f"  {review['id']} | {review['date']} | ⭐ {review['rating']} | {review['content'][:60]!r}")
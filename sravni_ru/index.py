@@ -1,13 +1,22 @@
 import json
+import os
 import re
-from typing import Optional, Dict, Any, List
+import sys
+from typing import Optional, Dict, Any, Deque, List
 import time
+from collections import deque
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from datetime import datetime, date
 
+from embedded_state import reviews_from_json, reviews_from_page_source
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from review_store import ReviewStore
+
 
 # Настройки для Chrome
 chrome_options = webdriver.ChromeOptions()
@@ -85,6 +94,99 @@ monthMap = {
 DATE_FROM = date(2025, 1, 1)
 DATE_TO   = date(2026, 2, 8) 
 
+SOURCE = "sravni_ru"  # ключ источника в общей базе review_store
+
+# Чистка DOM: разобранные карточки прячутся (display:none) и помечаются data-pruned-id,
+# видимыми остаются последние PRUNE_KEEP_LAST (по ним сайт подгружает следующие).
+# Узлы принадлежат React — их дети и data-id не трогаются, чтобы не сломать reconcile.
+PRUNE_DOM = True
+PRUNE_KEEP_LAST = 3
+PRUNE_EVERY = 20   # чистим пачкой раз в N разобранных отзывов
+
+CARD_BATCH = 20   # столько карточек из очереди читается одним скриптом
+SCROLL_INTERVAL_MS = 700   # как часто фоновый скролл дотягивает ленту вниз
+EMPTY_QUEUE_WAIT_S = 15    # сколько ждать новых карточек, когда очередь пуста
+EXPAND_TIMEOUT_MS = 2000   # потолок ожидания раскрытия «Читать» на пачку карточек
+
+# Сборщик новых карточек в странице: буфер ID вместо пересканирования всего DOM
+HARVEST_INSTALL_JS = """
+if (window.__sravniHarvest) return true;
+const h = { buffer: [], seen: new Set(), scrolling: true };
+const take = (n) => {
+    const id = n.getAttribute("data-id");
+    if (id && !h.seen.has(id)) { h.seen.add(id); h.buffer.push(id); }
+};
+new MutationObserver((mutations) => {
+    for (const m of mutations) {
+        for (const node of m.addedNodes) {
+            if (node.nodeType !== 1) continue;
+            if (node.matches("div[data-id]")) take(node);
+            else node.querySelectorAll("div[data-id]").forEach(take);
+        }
+    }
+}).observe(document.body, { childList: true, subtree: true });
+document.querySelectorAll("div[data-id]").forEach(take);
+setInterval(() => { if (h.scrolling) window.scrollTo(0, document.body.scrollHeight); }, arguments[0]);
+window.__sravniHarvest = h;
+return true;
+"""
+
+# Перехват XHR/fetch-ответов со списком отзывов: следующие порции приходят JSON-ом
+# того же формата, что и __NEXT_DATA__, — их разбирает embedded_state без DOM
+XHR_CAPTURE_JS = """
+if (window.__sravniXhr) return true;
+const bodies = [];
+window.__sravniXhr = bodies;
+const wanted = (url) => /review|otzyv/i.test(String(url || ""));
+
+const origFetch = window.fetch;
+window.fetch = function (...args) {
+    const p = origFetch.apply(this, args);
+    const url = (args[0] && args[0].url) || args[0];
+    if (wanted(url)) {
+        p.then((r) => r.clone().text()).then((t) => bodies.push(t)).catch(() => {});
+    }
+    return p;
+};
+
+const origOpen = XMLHttpRequest.prototype.open;
+XMLHttpRequest.prototype.open = function (method, url, ...rest) {
+    if (wanted(url)) {
+        this.addEventListener("load", () => {
+            try { bodies.push(this.responseText); } catch (e) {}
+        });
+    }
+    return origOpen.call(this, method, url, ...rest);
+};
+return true;
+"""
+
+XHR_DRAIN_JS = "return window.__sravniXhr ? window.__sravniXhr.splice(0) : [];"
+
+# Забирает накопленные ID и включает/выключает фоновый скролл
+HARVEST_DRAIN_JS = """
+const h = window.__sravniHarvest;
+if (!h) return null;
+h.scrolling = arguments[0];
+return h.buffer.splice(0);
+"""
+
+PRUNE_JS = """
+const ids = new Set(arguments[0]);
+const keep = arguments[1];
+const cards = document.querySelectorAll("div[data-id]:not([data-pruned-id])");
+const pruned = [];
+for (let i = 0; i < cards.length - keep; i++) {
+    const card = cards[i];
+    const id = card.getAttribute("data-id");
+    if (!ids.has(id)) continue;
+    card.style.display = "none";
+    card.setAttribute("data-pruned-id", id);
+    pruned.push(id);
+}
+return pruned;
+"""
+
 
 # Функция для парсинга даты
 def parseDate(dateText: str) -> str:
@@ -119,64 +221,84 @@ def in_date_range(date_iso: str) -> bool:
         return False
 
 
-# Функция для парсинга рейтинга по звездочкам
-def parseRating(driver, reviewElement) -> Optional[int]:
-    try:
-        rateContainer = reviewElement.find_element(By.CSS_SELECTOR, '[data-qa="Rate"]')
-        stars = rateContainer.find_elements(By.CSS_SELECTOR, "div._1expmgd._4czyoq")
-
-        filledStars = 0
-
-        for i in range(len(stars)):
-            try:
-                svgElement = stars[i].find_element(By.CSS_SELECTOR, 'svg[data-qa="Star"]')
-
-                cssVars = driver.execute_script(
-                    """
-                    const svgElement = arguments[0];
-                    const computedStyle = window.getComputedStyle(svgElement);
-
-                    const filledStroke = computedStyle.getPropertyValue('--rate-filled-stroke');
-                    const filledBgColor = computedStyle.getPropertyValue('--rate-filled-bgColor');
-                    const filledColor = computedStyle.getPropertyValue('--rate-filled-color');
-
-                    const unfilledStroke = computedStyle.getPropertyValue('--rate-unfilled-light-stroke');
-                    const unfilledBgColor = computedStyle.getPropertyValue('--rate-unfilled-light-bgColor');
-                    const unfilledColor = computedStyle.getPropertyValue('--rate-unfilled-light-color');
-
-                    const actualFill = computedStyle.fill;
-                    const actualStroke = computedStyle.stroke;
-                    const actualColor = computedStyle.color;
-
-                    return {
-                        filled: { stroke: filledStroke, bgColor: filledBgColor, color: filledColor },
-                        unfilled: { stroke: unfilledStroke, bgColor: unfilledBgColor, color: unfilledColor },
-                        actual: { fill: actualFill, stroke: actualStroke, color: actualColor }
-                    };
-                    """,
-                    svgElement,
-                )
-
-                filledColor = cssVars["filled"]["bgColor"]
-                actualFill = cssVars["actual"]["fill"]
-
-                isFilledColor = (
-                    ("229, 163, 69" in (actualFill or "")) or
-                    ("#e5a345" in (actualFill or "")) or
-                    (actualFill == filledColor)
-                )
-
-                if isFilledColor:
-                    filledStars += 1
+# Один скрипт на пачку карточек: раскрывает «Читать» и снимает все поля разом.
+# Рейтинг — по классу иконки звезды: заполненная "_1omk6of", пустая "_185atax".
+# Если хэши классов сменятся: заполненные звёзды идут первыми, считаем, сколько
+# иконок подряд совпадают по классу с первой (оценка на sravni.ru не бывает меньше 1).
+READ_CARDS_JS = """
+const ids = arguments[0];
+const expandTimeout = arguments[1];
+const done = arguments[arguments.length - 1];
+const FILLED = "_1omk6of";
+const EMPTY = "_185atax";
+
+const cards = (ids && ids.length)
+    ? ids.map((id) => document.querySelector(`div[data-id="${id}"]`)).filter(Boolean)
+    : Array.from(document.querySelectorAll("div[data-id]:not([data-pruned-id])"));
+
+const countStars = (card) => {
+    const rate = card.querySelector('[data-qa="Rate"]');
+    if (!rate) return null;
+    const icons = Array.from(rate.querySelectorAll('[data-qa="Icon"]'));
+    if (!icons.length) return null;
+    const known = icons.filter((i) => i.classList.contains(FILLED)).length;
+    if (known || icons.some((i) => i.classList.contains(EMPTY))) return known;
+    let n = 0;
+    while (n < icons.length && icons[n].className === icons[0].className) n++;
+    return n;
+};
+
+const textOf = (card) => card.querySelector('[class*="review-card_text"] span')?.innerText?.trim() || "";
+
+// длина текста до клика: раскрытие считается случившимся, когда текст вырос
+const pending = [];
+for (const card of cards) {
+    const more = card.querySelector("a._i91ye._qagut5");
+    if (more && more.textContent.trim() === "Читать") {
+        pending.push([card, textOf(card).length]);
+        more.click();
+    }
+}
 
-            except Exception as e:
-                print(f"   ⚠️  Не удалось обработать звездочку {i + 1}:", str(e))
+const read = () => done(cards.map((card) => ({
+    id: card.getAttribute("data-id"),
+    link: card.querySelector('a[class*="review-card_link"]')?.getAttribute("href") || null,
+    dateText: card.querySelector(".h-ml-12._10cf6rv._19sgipd .h-color-D30._1aja02n._1w66l1f")?.textContent?.trim() || "",
+    title: card.querySelector('[class*="review-card_title"]')?.innerText?.trim() || "",
+    text: textOf(card),
+    stars: countStars(card),
+})));
+
+// опрашиваем, пока все раскрытые тексты не станут длиннее, но не дольше expandTimeout
+// (setTimeout, а не requestAnimationFrame: в фоновой вкладке кадры не идут)
+const started = Date.now();
+const waitExpanded = () => {
+    const grown = pending.every(([card, before]) => textOf(card).length > before);
+    if (grown || Date.now() - started >= expandTimeout) read();
+    else setTimeout(waitExpanded, 50);
+};
+if (pending.length) setTimeout(waitExpanded, 0);
+else read();
+"""
+
+
+def readCards(driver, reviewIds: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Поля карточек (все div[data-id] или только reviewIds) за один вызов в браузер."""
+    try:
+        return driver.execute_async_script(READ_CARDS_JS, list(reviewIds or []), EXPAND_TIMEOUT_MS) or []
+    except Exception as error:
+        print("⚠️ Не удалось прочитать карточки:", str(error))
+        return []
 
-        return filledStars
 
+# Функция для чистки DOM от уже разобранных карточек
+def pruneParsedCards(driver, reviewIds: List[str], keep: int = PRUNE_KEEP_LAST) -> List[str]:
+    """Возвращает ID карточек, которые удалось спрятать."""
+    try:
+        return driver.execute_script(PRUNE_JS, list(reviewIds), keep) or []
     except Exception as error:
-        print("Не удалось определить рейтинг:", str(error))
-        return None
+        print("⚠️ Не удалось почистить DOM:", str(error))
+        return []
 
 
 # Функция для сохранения отзывов в JSON файл
@@ -190,74 +312,46 @@ def saveReviewsToFile(reviews: List[Dict[str, Any]], filename: str = "reviews.js
         print("❌ Ошибка при сохранении файла:", str(error))
 
 
-# Функция для парсинга одного отзыва
-def parseReview(driver, reviewElement) -> Optional[Dict[str, Any]]:
-    try:
-        reviewId = reviewElement.get_attribute("data-id")
-
-        linkElement = reviewElement.find_element(By.CSS_SELECTOR, 'a[class*="review-card_link"]')
-        reviewLink = linkElement.get_attribute("href")
-        fullLink = f"https://www.sravni.ru{reviewLink}" if (reviewLink or "").startswith("/") else reviewLink
-
-        reviewDate = ""
-        try:
-            dateContainer = reviewElement.find_element(By.CSS_SELECTOR, ".h-ml-12._10cf6rv._19sgipd")
-            dateElement = dateContainer.find_element(By.CSS_SELECTOR, ".h-color-D30._1aja02n._1w66l1f")
-            dateText = dateElement.text
-            reviewDate = parseDate(dateText)
-
-            if not in_date_range(reviewDate):
-                return None
-        except Exception:
-            print("Не удалось найти дату для отзыва", reviewId)
-
-        rating = parseRating(driver, reviewElement)
-
-        title = ""
-        try:
-            titleElement = reviewElement.find_element(By.CSS_SELECTOR, '[class*="review-card_title"]')
-            title = titleElement.text
-        except Exception:
-            print("Не удалось найти заголовок для отзыва", reviewId)
-
-        # Нажимаем кнопку "Читать" если она есть
-        try:
-            readButton = reviewElement.find_element(By.CSS_SELECTOR, "a._i91ye._qagut5")
-            driver.execute_script("arguments[0].click();", readButton)
-            time.sleep(0.3)
-        except Exception:
-            print('Кнопка "Читать" не найдена или уже развернут текст для отзыва', reviewId)
-
-        reviewText = ""
-        try:
-            textElement = reviewElement.find_element(By.CSS_SELECTOR, '[class*="review-card_text"] span')
-            reviewText = textElement.text
-        except Exception:
-            print("Не удалось найти текст для отзыва", reviewId)
-
-        fullContent = f"{title}\n\n{reviewText}" if (title and reviewText) else (title or reviewText)
-
-        return {
-            "id": reviewId,
-            "link": fullLink,
-            "date": reviewDate,
-            "rating": rating,
-            "content": (fullContent or "").strip(),
-        }
+# Функция для сборки отзыва из снятой карточки (DOM-путь, если в JSON отзыва нет)
+def cardToReview(card: Dict[str, Any]) -> Dict[str, Any]:
+    reviewId = card.get("id")
+    reviewLink = card.get("link") or ""
+    fullLink = f"https://www.sravni.ru{reviewLink}" if reviewLink.startswith("/") else reviewLink
 
-    except Exception as error:
-        print("Ошибка при парсинге отзыва:", str(error))
-        return None
+    reviewDate = ""
+    if card.get("dateText"):
+        reviewDate = parseDate(card["dateText"])
+    else:
+        print("Не удалось найти дату для отзыва", reviewId)
+
+    title = card.get("title") or ""
+    reviewText = card.get("text") or ""
+    if not title:
+        print("Не удалось найти заголовок для отзыва", reviewId)
+    if not reviewText:
+        print("Не удалось найти текст для отзыва", reviewId)
+
+    fullContent = f"{title}\n\n{reviewText}" if (title and reviewText) else (title or reviewText)
+
+    return {
+        "id": reviewId,
+        "link": fullLink,
+        "date": reviewDate,
+        "rating": card.get("stars"),
+        "content": (fullContent or "").strip(),
+    }
 
 
 # Главная функция парсера
 def parseSravniGazprombank() -> None:
     driver = None
+    store = ReviewStore()
 
     try:
         print("🚀 Запуск парсера Sravni.ru для Газпромбанка...")
 
         driver = webdriver.Chrome(options=chrome_options)
+        driver.set_script_timeout(30)
         print("✅ Chrome драйвер запущен")
 
         url = "https://www.sravni.ru/bank/gazprombank/otzyvy/?orderby=byDate"
@@ -372,106 +466,54 @@ def parseSravniGazprombank() -> None:
         targetReviews = 1000
         reviews: List[Dict[str, Any]] = []
         parsedIds = set()
-        reviewQueue: List[str] = []
+        seenIds = set()                 # всё, что когда-либо попадало в очередь
+        reviewQueue: Deque[str] = deque()
+        toPrune: List[str] = []
+        prunedTotal = 0
 
         print(f"🎯 Цель: спарсить {targetReviews} отзывов")
 
-        keepScrolling = True
-
-        def startBackgroundScroll():
-            nonlocal keepScrolling, reviewQueue, reviews
-
-            while keepScrolling:
-                if len(reviewQueue) + len(reviews) >= targetReviews:
-                    print(
-                        f"🛑 Достаточно отзывов в очереди ({len(reviewQueue)}) + обработано ({len(reviews)}) = "
-                        f"{len(reviewQueue) + len(reviews)}. Останавливаем скролл."
-                    )
-                    break
-
-                if len(reviewQueue) > 0:
-                    lastReviewId = reviewQueue[-1]
-                    try:
-                        lastElement = driver.find_element(By.CSS_SELECTOR, f'div[data-id="{lastReviewId}"]')
-                        driver.execute_script(
-                            "arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});",
-                            lastElement,
-                        )
-                        print(f"🎯 Скроллим к якорю - последнему отзыву в очереди: {lastReviewId}")
-                    except Exception:
-                        driver.execute_script("window.scrollBy(0, 300);")
-                else:
-                    driver.execute_script("window.scrollBy(0, 300);")
-
-                time.sleep(2)
-
-        def updateReviewQueue() -> int:
-            nonlocal reviewQueue, reviews
-            driver.execute_script("window.scrollBy(0, 1200);")
-            time.sleep(1.5)
-            print("🔍 Пересканируем страницу для поиска новых отзывов...")
-
-            # 1) скроллим вниз (чтобы сайт подгрузил новые карточки)
-            before = len(driver.find_elements(By.CSS_SELECTOR, "div[data-id]"))
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-
-            # 2) ждём, что количество карточек увеличится (или хотя бы не упадёт)
-            try:
-                WebDriverWait(driver, 10).until(
-                    lambda d: len(d.find_elements(By.CSS_SELECTOR, "div[data-id]")) > before
-                )
-            except Exception:
-                pass  # если не подгрузилось — просто продолжим (логика не ломается)
-
-            # 3) теперь заново читаем элементы
-            currentReviewElements = driver.find_elements(By.CSS_SELECTOR, "div[data-id]")
-
-            print(f"📋 Найдено {len(currentReviewElements)} отзывов на странице")
-
-            # дальше твой код без изменений:
-            reviewQueue = []
-
-            newReviewsFound = 0
-            duplicatesSkipped = 0
-
-            for reviewElement in currentReviewElements:
-                if len(reviewQueue) + len(reviews) >= targetReviews:
-                    print(
-                        f"🎯 Достигнута цель: в очереди ({len(reviewQueue)}) + обработано ({len(reviews)}) = "
-                        f"{len(reviewQueue) + len(reviews)} отзывов"
-                    )
-                    break
+        # Отзывы из JSON страницы (__NEXT_DATA__) и перехваченных XHR: id -> готовая запись
+        driver.execute_script(XHR_CAPTURE_JS)
+        embedded: Dict[str, Dict[str, Any]] = reviews_from_page_source(driver.page_source)
+        print(f"🧾 Отзывов в JSON страницы: {len(embedded)}")
 
+        def pullEmbedded() -> None:
+            for body in driver.execute_script(XHR_DRAIN_JS) or []:
                 try:
-                    reviewId = reviewElement.get_attribute("data-id")
-
-                    if reviewId in parsedIds:
-                        duplicatesSkipped += 1
-                        continue
-
-                    reviewQueue.append(reviewId)
-                    newReviewsFound += 1
-
-                except Exception as e:
-                    print("⚠️ Не удалось получить ID отзыва:", str(e))
-
-            print(f"📈 Добавлено в очередь: {newReviewsFound} новых отзывов")
-
-            if duplicatesSkipped > 0:
-                print(f"⚠️ Пропущено {duplicatesSkipped} уже обработанных отзывов")
-
-            print(f"📊 Текущая очередь: {len(reviewQueue)} отзывов")
-            print(f"📊 Уже обработано: {len(parsedIds)} отзывов")
-            print(f"📊 Всего на странице: {len(currentReviewElements)} отзывов")
-
-            if newReviewsFound > 0:
-                head = reviewQueue[:3]
-                print("🆔 Новые ID в очереди:", head, f"... и еще {len(reviewQueue) - 3}" if len(reviewQueue) > 3 else "")
-
-            return newReviewsFound
+                    embedded.update(reviews_from_json(json.loads(body)))
+                except ValueError:
+                    continue
+
+        # Сборщик в странице: MutationObserver складывает ID новых карточек в буфер,
+        # фоновый таймер скроллит вниз, пока Python не скажет «хватит»
+        driver.execute_script(HARVEST_INSTALL_JS, SCROLL_INTERVAL_MS)
+
+        def pullNewIds(keepScrolling: bool) -> int:
+            ids = driver.execute_script(HARVEST_DRAIN_JS, keepScrolling)
+            if ids is None:
+                # страница перерисовалась целиком — ставим сборщик заново
+                driver.execute_script(HARVEST_INSTALL_JS, SCROLL_INTERVAL_MS)
+                ids = driver.execute_script(HARVEST_DRAIN_JS, keepScrolling)
+
+            added = 0
+            for reviewId in ids or []:
+                if reviewId in seenIds:
+                    continue
+                seenIds.add(reviewId)
+                reviewQueue.append(reviewId)
+                added += 1
+            return added
+
+        def waitForNewIds(timeoutS: float) -> int:
+            try:
+                return WebDriverWait(driver, timeoutS, poll_frequency=0.25).until(lambda d: pullNewIds(True))
+            except TimeoutException:
+                return 0
 
-        print("\n🔍 Выполняем начальное сканирование страницы...")
-        initialNewReviews = updateReviewQueue()
+        pullNewIds(True)
+        if len(reviewQueue) == 0:
+            waitForNewIds(EMPTY_QUEUE_WAIT_S)
         print(f"📋 Начальная очередь: {len(reviewQueue)} отзывов")
 
         if len(reviewQueue) == 0:
@@ -495,77 +537,78 @@ def parseSravniGazprombank() -> None:
             print(f"✅ Проверка уникальности пройдена: все {len(reviewsList)} отзывов уникальны")
             return True
 
-        # JS: запуск фонового скролла как async task.
-        # В Python без потоков — механически вызываем 1 раз перед циклом как "параллельного" не делаем.
-        # (Логику основного цикла не меняем ниже.)
-        # ВНИМАНИЕ: это место в JS реально параллелит; здесь оставлено как есть без запуска фонового потока.
+        reachedOld = False
+        while len(reviews) < targetReviews and not reachedOld:
+            # скролл нужен, только пока очереди не хватает до цели (плюс одна пачка про запас)
+            pullNewIds(len(reviewQueue) + len(reviews) < targetReviews + CARD_BATCH)
 
-        while len(reviews) < targetReviews and len(reviewQueue) > 0:
-            currentReviewId = reviewQueue.pop(0)
-
-            print(f"\n📝 Парсим отзыв {len(reviews) + 1} из {targetReviews} (ID: {currentReviewId})...")
-            print(f"📊 Осталось в очереди: {len(reviewQueue)} отзывов")
-
-            try:
-                currentReviewElement = driver.find_element(By.CSS_SELECTOR, f'div[data-id="{currentReviewId}"]')
-            except Exception:
-                print(f"❌ Не удалось найти элемент отзыва с ID {currentReviewId}, возможно элемент устарел")
+            if len(reviewQueue) == 0:
+                print(f"\n⬇️ Очередь пуста, ждём новые карточки до {EMPTY_QUEUE_WAIT_S} с...")
+                if waitForNewIds(EMPTY_QUEUE_WAIT_S) == 0:
+                    print(f"\n🏁 Больше отзывов не найдено. Возможно, это все доступные отзывы. Итого спарсено: {len(reviews)} отзывов")
+                    break
                 continue
 
-            review = parseReview(driver, currentReviewElement)
+            batch = [reviewQueue.popleft() for _ in range(min(CARD_BATCH, len(reviewQueue)))]
+
+            # сначала JSON страницы/XHR, DOM — только для того, чего там не нашлось
+            pullEmbedded()
+            domIds = [rid for rid in batch if rid not in embedded]
+            cards = {card.get("id"): card for card in readCards(driver, domIds)} if domIds else {}
+            print(
+                f"\n📦 Пачка из {len(batch)} карточек (из JSON {len(batch) - len(domIds)}, из DOM {len(domIds)}) | "
+                f"в очереди {len(reviewQueue)} | спарсено {len(reviews)}/{targetReviews}"
+            )
+
+            for currentReviewId in batch:
+                if currentReviewId in embedded:
+                    review = embedded.pop(currentReviewId)
+                elif currentReviewId in cards:
+                    review = cardToReview(cards[currentReviewId])
+                else:
+                    print(f"❌ Не удалось найти элемент отзыва с ID {currentReviewId}, возможно элемент устарел")
+                    continue
 
-            # --- СТОП если ушли ниже нужного диапазона дат ---
-            if review is None:
-                try:
-                    dateContainer = currentReviewElement.find_element(By.CSS_SELECTOR, ".h-ml-12._10cf6rv._19sgipd")
-                    dateElement = dateContainer.find_element(By.CSS_SELECTOR, ".h-color-D30._1aja02n._1w66l1f")
-                    dateText = dateElement.text
-                    reviewDate = parseDate(dateText)
+                if review.get("date") and not in_date_range(review["date"]):
+                    # --- СТОП если ушли ниже нужного диапазона дат ---
+                    try:
+                        d = datetime.strptime(review.get("date") or "", "%Y-%m-%d").date()
 
-                    from datetime import datetime
-                    d = datetime.strptime(reviewDate, "%Y-%m-%d").date()
+                        if d < DATE_FROM:
+                            print(f"\n🛑 Дошли до отзывов старше {DATE_FROM}. Дальше парсить бессмысленно.")
+                            reachedOld = True
+                            break
 
-                    if d < DATE_FROM:
-                        print(f"\n🛑 Дошли до отзывов старше {DATE_FROM}. Дальше парсить бессмысленно.")
-                        break
+                    except Exception:
+                        pass
+                    print(f"❌ Отзыв {currentReviewId} вне диапазона дат")
+                    continue
 
-                except Exception:
-                    pass
-            if review:
                 reviews.append(review)
+                store.upsert(SOURCE, review)
                 parsedIds.add(currentReviewId)
 
-                print(f"✅ Отзыв {review.get('id')} успешно спарсен")
+                if PRUNE_DOM:
+                    toPrune.append(currentReviewId)
+                    if len(toPrune) >= PRUNE_EVERY:
+                        pruned = set(pruneParsedCards(driver, toPrune))
+                        prunedTotal += len(pruned)
+                        # карточки из «хвоста» остаются живыми — почистим их в следующий раз
+                        toPrune = [rid for rid in toPrune if rid not in pruned]
+                        print(f"🧹 Спрятано карточек: {len(pruned)} (всего {prunedTotal})")
+
+                print(f"✅ Отзыв {review.get('id')} успешно спарсен ({len(reviews)}/{targetReviews})")
                 print(f"   📅 Дата: {review.get('date')}")
                 print(f"   ⭐ Рейтинг: {review.get('rating')}/5")
                 print(f"   🔗 Ссылка: {review.get('link')}")
                 content = review.get("content") or ""
                 print(f"   📄 Контент: {content[:100]}...")
 
-                time.sleep(0.2)
-
-                print(f"🔄 Пересканируем страницу после парсинга отзыва {review.get('id')}...")
-                foundNewReviews = updateReviewQueue()
-
-                if foundNewReviews > 0:
-                    print(f"🎉 Отлично! После скролла найдено {foundNewReviews} новых отзывов!")
-                else:
-                    print("ℹ️ Новых отзывов после скролла не найдено")
-
-            else:
-                print(f"❌ Не удалось спарсить отзыв {currentReviewId}")
-
-            time.sleep(0.1)
-
-            if len(reviewQueue) == 0 and len(reviews) < targetReviews:
-                print("\n⬇️ Очередь пуста, ждем 5 секунд и пересканируем страницу...")
-                time.sleep(5)
-                newReviewsFound = updateReviewQueue()
-                if len(reviewQueue) == 0:
-                    print(f"\n🏁 Больше отзывов не найдено. Возможно, это все доступные отзывы. Итого спарсено: {len(reviews)} отзывов")
+                if len(reviews) >= targetReviews:
                     break
 
-        keepScrolling = False
+        driver.execute_script(HARVEST_DRAIN_JS, False)  # останавливаем фоновый скролл
+
         print("🔍 Выполняем финальную проверку на дубликаты...")
         validateUniqueReviews(reviews)
 
@@ -587,6 +630,7 @@ def parseSravniGazprombank() -> None:
     except Exception as error:
         print("❌ Ошибка при работе парсера:", str(error))
     finally:
+        store.close()
         if driver:
             print("🔄 Парсинг завершен, браузер остается открытым для изучения...")
             # driver.quit()  # Закомментировано - браузер остается открытым
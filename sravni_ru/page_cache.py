@@ -0,0 +1,40 @@
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+
+class PageCache:
+    """
+    Кэш того, что снято со страницы отзыва ({product, city, status}), с ключом по URL.
+    Запись живёт ttl_s секунд; force_refresh=True — игнорировать кэш при чтении.
+    """
+
+    def __init__(self, path: str, ttl_s: float, force_refresh: bool = False) -> None:
+        self.ttl_s = ttl_s
+        self.force_refresh = force_refresh
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        if self.force_refresh or not url:
+            return None
+        row = self.conn.execute("SELECT data, fetched_at FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_s:
+            return None
+        return json.loads(row[0])
+
+    def put(self, url: str, data: Dict[str, Any]) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO pages (url, data, fetched_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET data = excluded.data, fetched_at = excluded.fetched_at",
+                (url, json.dumps(data, ensure_ascii=False), time.time()),
+            )
+
+    def close(self) -> None:
+        self.conn.close()
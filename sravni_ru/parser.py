@@ -1,11 +1,19 @@
 import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+from page_cache import PageCache
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from review_store import ReviewStore
 
 
 # Настройки для Chrome
@@ -27,6 +35,19 @@ chrome_options.add_argument("--ignore-ssl-errors")
 chrome_options.add_argument("--allow-running-insecure-content")
 
 
+SOURCE = "sravni_ru"  # ключ источника в общей базе review_store
+
+ENRICH_FIELDS = ("product", "city", "status")
+
+DRIVER_WORKERS = 4       # сколько браузеров открывают страницы отзывов параллельно
+SELECTOR_TIMEOUT_S = 5   # общий потолок ожидания продукта/статуса/города (было до 3 + 2 + 3 + 2 с)
+PRIMARY_TIMEOUT_S = 3    # столько ждём основные селекторы, только потом соглашаемся на запасные
+
+# Кэш страниц отзывов: продукт/город/статус почти не меняются — повторно не открываем
+CACHE_FILE = "./page_cache.sqlite"
+CACHE_TTL_DAYS = 30
+FORCE_REFRESH = False    # True — открыть все страницы заново и обновить кэш
+
 # Конфигурация
 CONFIG = {
     "startDate": datetime.fromisoformat("2024-01-01"),
@@ -58,66 +79,77 @@ def filter_by_date(reviews: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return out
 
 
+# Все селекторы (основные и запасные) снимаются одним скриптом за опрос;
+# запасные (*Alt — общие классы) принимаются только после PRIMARY_TIMEOUT_S
+PAGE_DATA_JS = """
+const pick = (sel) => Array.from(document.querySelectorAll(sel))
+    .map((e) => (e.innerText || e.textContent || "").trim());
+return {
+    product: pick(".h-color-D30.h-mr-16._1w66l1f"),
+    productAlt: pick('[class*="h-color-D30"]'),
+    badges: pick("._1vfu01w._1mxed63._8km2y3"),
+    badgesAlt: pick('[class*="_1vfu01w"]'),
+};
+"""
+
+
+def _page_snapshot(driver: webdriver.Chrome) -> Dict[str, List[str]]:
+    return driver.execute_script(PAGE_DATA_JS) or {}
+
+
+def _ready_primary(driver: webdriver.Chrome) -> Any:
+    """Снимок, если основные селекторы нашли и продукт, и статус/город; иначе False — ждём дальше."""
+    snap = _page_snapshot(driver)
+    return snap if (snap.get("product") and snap.get("badges")) else False
+
+
+def _ready_snapshot(driver: webdriver.Chrome) -> Any:
+    """То же, но с запасными селекторами — после того как основные не дождались."""
+    snap = _page_snapshot(driver)
+    ready = (snap.get("product") or snap.get("productAlt")) and (snap.get("badges") or snap.get("badgesAlt"))
+    return snap if ready else False
+
+
 # Функция для парсинга города и продукта со страницы
 def parse_page_data(driver: webdriver.Chrome, url: str) -> Dict[str, Optional[str]]:
     try:
         print(f"  📄 Открываем страницу: {url}")
         driver.get(url)
 
-        # Ждем загрузки хотя бы одного из элементов (продукт или город)
+        # Сначала ждём основные селекторы; запасные — только после PRIMARY_TIMEOUT_S,
+        # чтобы общий класс не подменил ещё не отрисованный основной элемент
+        snap: Dict[str, List[str]] = {}
         try:
-            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, "body")))
-            driver.implicitly_wait(0)  # не влияет на sleep, но оставлено как "ничего"
-            driver.sleep(0.1)  # механический аналог driver.sleep(100) в JS (ms)
-        except Exception:
-            print("    ⚠️  Страница не загрузилась полностью")
+            snap = WebDriverWait(driver, PRIMARY_TIMEOUT_S, poll_frequency=0.2).until(_ready_primary)
+        except TimeoutException:
+            try:
+                snap = WebDriverWait(
+                    driver, SELECTOR_TIMEOUT_S - PRIMARY_TIMEOUT_S, poll_frequency=0.2
+                ).until(_ready_snapshot)
+            except TimeoutException:
+                snap = _page_snapshot(driver)
 
         product: Optional[str] = None
         city: Optional[str] = None
         status: Optional[str] = None
 
-        # Поиск продукта по классу h-color-D30 h-mr-16 _1w66l1f
-        try:
-            WebDriverWait(driver, 3).until(EC.presence_of_element_located((By.CSS_SELECTOR, ".h-color-D30.h-mr-16._1w66l1f")))
-            product_element = driver.find_element(By.CSS_SELECTOR, ".h-color-D30.h-mr-16._1w66l1f")
-            product = (product_element.text or "").strip()
-        except Exception:
-            # Пробуем найти альтернативными селекторами
-            try:
-                WebDriverWait(driver, 2).until(EC.presence_of_element_located((By.CSS_SELECTOR, '[class*="h-color-D30"]')))
-                product_element = driver.find_element(By.CSS_SELECTOR, '[class*="h-color-D30"]')
-                product = (product_element.text or "").strip()
-            except Exception:
-                print("    ⚠️  Продукт не найден")
-
-        # Поиск статуса проблемы и города по классу _1vfu01w _1mxed63 _8km2y3
-        try:
-            WebDriverWait(driver, 3).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "._1vfu01w._1mxed63._8km2y3")))
-            status_elements = driver.find_elements(By.CSS_SELECTOR, "._1vfu01w._1mxed63._8km2y3")
-
-            if len(status_elements) >= 1:
-                status = (status_elements[0].text or "").strip()
-
-            if len(status_elements) >= 2:
-                city = (status_elements[1].text or "").strip()
-            elif len(status_elements) == 1:
-                print("    ⚠️  Найден только статус, ищем город альтернативно")
-
-        except Exception:
-            # Пробуем найти альтернативными селекторами
-            try:
-                WebDriverWait(driver, 2).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, '[class*="_1vfu01w"]')))
-                status_elements = driver.find_elements(By.CSS_SELECTOR, '[class*="_1vfu01w"]')
-
-                if len(status_elements) >= 1:
-                    status = (status_elements[0].text or "").strip()
-
-                if len(status_elements) >= 2:
-                    city = (status_elements[1].text or "").strip()
-                elif len(status_elements) == 1:
-                    print("    ⚠️  Найден только статус альтернативно")
-            except Exception:
-                print("    ⚠️  Статус и город не найдены")
+        # Продукт: класс h-color-D30 h-mr-16 _1w66l1f, иначе любой h-color-D30
+        products = snap.get("product") or snap.get("productAlt") or []
+        if products:
+            product = products[0]
+        else:
+            print("    ⚠️  Продукт не найден")
+
+        # Статус проблемы и город: класс _1vfu01w _1mxed63 _8km2y3, иначе любой _1vfu01w
+        status_elements = snap.get("badges") or snap.get("badgesAlt") or []
+        if len(status_elements) >= 1:
+            status = status_elements[0]
+        if len(status_elements) >= 2:
+            city = status_elements[1]
+        elif len(status_elements) == 1:
+            print("    ⚠️  Найден только статус, город не найден")
+        else:
+            print("    ⚠️  Статус и город не найдены")
 
         return {"product": product, "city": city, "status": status}
 
@@ -166,15 +198,39 @@ def save_dataset(data: List[Dict[str, Any]]) -> None:
         print("❌ Ошибка при сохранении dataset.json:", str(error))
 
 
+# Пул браузеров: у каждого потока свой Chrome (WebDriver не потокобезопасен)
+class DriverPool:
+    def __init__(self) -> None:
+        self.local = threading.local()
+        self.drivers: List[webdriver.Chrome] = []
+        self.lock = threading.Lock()
+
+    def get(self) -> webdriver.Chrome:
+        driver = getattr(self.local, "driver", None)
+        if driver is None:
+            driver = webdriver.Chrome(options=chrome_options)
+            self.local.driver = driver
+            with self.lock:
+                self.drivers.append(driver)
+            print(f"✅ WebDriver #{len(self.drivers)} инициализирован")
+        return driver
+
+    def close(self) -> None:
+        for driver in self.drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        print(f"🔚 Закрыто WebDriver: {len(self.drivers)}")
+
+
 # Основная функция парсера
 def parse_reviews_data() -> List[Dict[str, Any]]:
-    driver = None
+    pool = DriverPool()
+    store = ReviewStore()
+    cache = PageCache(CACHE_FILE, CACHE_TTL_DAYS * 86400, force_refresh=FORCE_REFRESH)
 
     try:
-        print("🚀 Инициализируем WebDriver...")
-        driver = webdriver.Chrome(options=chrome_options)
-        print("✅ WebDriver инициализирован")
-
         print("\n📖 Загружаем данные из reviews.json...")
         all_reviews = load_reviews()
         print(f"📋 Всего отзывов: {len(all_reviews)}")
@@ -188,14 +244,39 @@ def parse_reviews_data() -> List[Dict[str, Any]]:
             return []
 
         reviews_to_process = filtered_reviews
-        print(f"\n🧪 Обрабатываем все {len(reviews_to_process)} подходящих отзывов...")
-
-        processed_reviews: List[Dict[str, Any]] = []
 
-        for i in range(len(reviews_to_process)):
-            review = reviews_to_process[i]
-            processed_review = process_review(driver, review, i)
-            processed_reviews.append(processed_review)
+        # результаты кладутся по индексу — порядок совпадает с исходным списком
+        processed_reviews: List[Optional[Dict[str, Any]]] = [None] * len(reviews_to_process)
+
+        to_fetch: List[int] = []
+        for i, review in enumerate(reviews_to_process):
+            cached = cache.get(review.get("link"))
+            if cached is None:
+                to_fetch.append(i)
+                continue
+            processed_review = dict(review)
+            processed_review.update({k: cached.get(k) for k in ENRICH_FIELDS})
+            processed_reviews[i] = processed_review
+            store.upsert(SOURCE, processed_review)
+        print(f"🗃️  Из кэша: {len(reviews_to_process) - len(to_fetch)}, открыть заново: {len(to_fetch)}")
+
+        workers = max(1, min(DRIVER_WORKERS, len(to_fetch)))
+        if to_fetch:
+            print(f"\n🧪 Обрабатываем {len(to_fetch)} отзывов в {workers} браузерах...")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(lambda r=reviews_to_process[i], i=i: process_review(pool.get(), r, i)): i
+                for i in to_fetch
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                processed_review = future.result()
+                processed_reviews[i] = processed_review
+                # запись в базу и кэш — только из главного потока
+                store.upsert(SOURCE, processed_review)
+                if any(processed_review.get(k) for k in ENRICH_FIELDS):
+                    cache.put(processed_review.get("link"), {k: processed_review.get(k) for k in ENRICH_FIELDS})
 
         save_dataset(processed_reviews)
 
@@ -206,9 +287,9 @@ def parse_reviews_data() -> List[Dict[str, Any]]:
         print("❌ Ошибка при выполнении:", str(error))
         return []
     finally:
-        if driver:
-            driver.quit()
-            print("🔚 WebDriver закрыт")
+        cache.close()
+        store.close()
+        pool.close()
 
 
 if __name__ == "__main__":
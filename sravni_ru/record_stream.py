@@ -0,0 +1,100 @@
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO
+
+# Потоковое чтение/запись записей: в памяти держится одна запись, а не весь файл.
+# Вход — JSON-массив объектов (как пишут index.py/parser.py) или JSONL, формат
+# определяется по первому непробельному символу.
+
+CHUNK_SIZE = 1 << 16
+
+_decoder = json.JSONDecoder()
+
+
+def _iter_json_array(f: TextIO, buf: str) -> Iterator[Dict[str, Any]]:
+    pos = buf.index("[") + 1
+    eof = False
+    while True:
+        # пропускаем пробелы и запятые между элементами
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            buf, pos = f.read(CHUNK_SIZE), 0
+            eof = not buf
+        if pos >= len(buf):
+            raise ValueError("JSON-массив оборван: нет закрывающей ']'")
+        if buf[pos] == "]":
+            return
+        try:
+            item, end = _decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        yield item
+        buf, pos = buf[end:], 0
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Записи файла по одной — JSON-массив или JSONL."""
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        while not buf.strip():
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            buf += chunk
+        if buf.lstrip().startswith("["):
+            yield from _iter_json_array(f, buf)
+            return
+        # JSONL: по объекту на строку, пустые строки пропускаются
+        head, _, tail = buf.rpartition("\n")
+        for line in head.split("\n") + [tail + f.readline()]:
+            if line.strip():
+                yield json.loads(line)
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class RecordWriter:
+    """
+    Пишет записи по мере поступления. *.jsonl — по строке на запись,
+    иначе JSON-массив в том же виде, что json.dump(..., indent=2).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.jsonl = path.endswith(".jsonl")
+        self.count = 0
+        self.f: Optional[TextIO] = None
+
+    def __enter__(self) -> "RecordWriter":
+        self.f = open(self.path, "w", encoding="utf-8")
+        if not self.jsonl:
+            self.f.write("[")
+        return self
+
+    def write(self, record: Dict[str, Any]) -> None:
+        assert self.f is not None
+        if self.jsonl:
+            self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            body = json.dumps(record, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            self.f.write(("," if self.count else "") + "\n  " + body)
+        self.count += 1
+
+    def write_all(self, records: Iterable[Dict[str, Any]]) -> int:
+        for record in records:
+            self.write(record)
+        return self.count
+
+    def __exit__(self, *exc: Any) -> None:
+        assert self.f is not None
+        if not self.jsonl:
+            self.f.write("\n]" if self.count else "]")
+        self.f.close()
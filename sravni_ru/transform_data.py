@@ -1,81 +1,103 @@
-import json
+from typing import Any, Dict, Iterable, Iterator
 
+from count_reviews import DateWindowCounter
+from record_stream import RecordWriter, iter_records
 
-def transform_data() -> None:
-    print("Начинаем преобразование dataset.json...")
-
-    # Читаем исходный файл
-    with open("dataset.json", "r", encoding="utf-8") as f:
-        dataset = json.load(f)
+INPUT_FILE = "dataset.json"   # JSON-массив или JSONL
+OUTPUT_FILE = "data.json"     # *.jsonl — писать построчно
+# Подсчёт окна дат count_reviews в том же проходе — по INPUT_FILE, а не по reviews.json.
+# dataset.json от parser.py уже отфильтрован по тому же окну, так что на нём счёт
+# покажет ~100%; включать, только если INPUT_FILE — неотфильтрованная выгрузка.
+COUNT_WINDOW = False
 
-    print(f"Найдено {len(dataset)} записей для обработки")
 
-    transformed_data = []
+def transform_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    # Извлекаем title и text из content
+    title = ""
+    text = ""
 
-    for index, item in enumerate(dataset):
-        # Извлекаем title и text из content
-        title = ""
-        text = ""
+    content = item.get("content")
+    if content:
+        double_newline_index = content.find("\n\n")
 
-        content = item.get("content")
-        if content:
-            double_newline_index = content.find("\n\n")
-
-            if double_newline_index != -1:
-                title = content[:double_newline_index].strip()
-                text = content[double_newline_index + 2 :].strip()
-            else:
-                single_newline_index = content.find("\n")
-                if single_newline_index != -1:
-                    title = content[:single_newline_index].strip()
-                    text = content[single_newline_index + 1 :].strip()
-                else:
-                    title = content.strip()
-                    text = ""
-
-        # Преобразуем статус
-        status = ""
-        if item.get("status") == "ПРОВЕРЕН":
-            status = "verified"
-        elif item.get("status") == "ПРОБЛЕМА РЕШЕНА":
-            status = "decided"
+        if double_newline_index != -1:
+            title = content[:double_newline_index].strip()
+            text = content[double_newline_index + 2 :].strip()
         else:
-            status = item.get("status").lower() if item.get("status") else ""
-
-        # Создаем новый объект с нужным порядком полей
-        transformed_item = {
-            "id": int(item.get("id")) if item.get("id") is not None else 0,
-            "link": item.get("link") or "",
-            "date": item.get("date") or "",
-            "title": title,
-            "text": text,
-            "rating": str(item.get("rating")) if item.get("rating") is not None else "",
-            "status": status,
-        }
-
-        # Добавляем product только если он есть (перед city)
-        if item.get("product"):
-            transformed_item["product"] = item.get("product")
-
-        # Добавляем city в конце
-        transformed_item["city"] = item.get("city") or ""
-
+            single_newline_index = content.find("\n")
+            if single_newline_index != -1:
+                title = content[:single_newline_index].strip()
+                text = content[single_newline_index + 1 :].strip()
+            else:
+                title = content.strip()
+                text = ""
+
+    # Преобразуем статус
+    status = ""
+    if item.get("status") == "ПРОВЕРЕН":
+        status = "verified"
+    elif item.get("status") == "ПРОБЛЕМА РЕШЕНА":
+        status = "decided"
+    else:
+        status = item.get("status").lower() if item.get("status") else ""
+
+    # Создаем новый объект с нужным порядком полей
+    transformed_item = {
+        "id": int(item.get("id")) if item.get("id") is not None else 0,
+        "link": item.get("link") or "",
+        "date": item.get("date") or "",
+        "title": title,
+        "text": text,
+        "rating": str(item.get("rating")) if item.get("rating") is not None else "",
+        "status": status,
+    }
+
+    # Добавляем product только если он есть (перед city)
+    if item.get("product"):
+        transformed_item["product"] = item.get("product")
+
+    # Добавляем city в конце
+    transformed_item["city"] = item.get("city") or ""
+
+    return transformed_item
+
+
+def transform_stream(records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    for index, item in enumerate(records):
         # Логируем прогресс каждые 1000 записей
         if (index + 1) % 1000 == 0:
             print(f"Обработано {index + 1} записей...")
+        yield transform_item(item)
 
-        transformed_data.append(transformed_item)
 
-    # Записываем результат в новый файл
-    with open("data.json", "w", encoding="utf-8") as f:
-        json.dump(transformed_data, f, ensure_ascii=False, indent=2)
-
-    print(f"✅ Преобразование завершено! Создан файл data.json с {len(transformed_data)} записями")
+def transform_data() -> None:
+    """
+    INPUT_FILE -> OUTPUT_FILE построчно. При COUNT_WINDOW заодно считает окно дат
+    по записям INPUT_FILE (для сырого reviews.json — отдельно count_reviews.py).
+    """
+    print(f"Начинаем преобразование {INPUT_FILE}...")
+
+    # Записи читаются и пишутся по одной — весь файл в памяти не держится;
+    # счётчик (COUNT_WINDOW) видит ровно записи INPUT_FILE
+    records = iter_records(INPUT_FILE)
+    counter = DateWindowCounter() if COUNT_WINDOW else None
+    if counter is not None:
+        records = counter.tap(records)
+
+    examples = []
+    with RecordWriter(OUTPUT_FILE) as out:
+        for transformed_item in transform_stream(records):
+            if len(examples) < 3:
+                examples.append(transformed_item)
+            out.write(transformed_item)
+
+    print(f"✅ Преобразование завершено! Создан файл {OUTPUT_FILE} с {out.count} записями")
+    if counter is not None:
+        counter.report()
     print("📊 Примеры преобразованных записей:")
 
     # Показываем несколько примеров
-    for i in range(min(3, len(transformed_data))):
-        ex = transformed_data[i]
+    for i, ex in enumerate(examples):
         print(f"\nПример {i + 1}:")
         print("Title:", ex.get("title", ""))
         preview = (ex.get("text") or "")
@@ -86,8 +108,9 @@ def transform_data() -> None:
 
 
 # Запускаем преобразование
-try:
-    transform_data()
-except Exception as error:
-    print("❌ Ошибка при преобразовании данных:", str(error))
-    raise SystemExit(1)
\ No newline at end of file
+if __name__ == "__main__":
+    try:
+        transform_data()
+    except Exception as error:
+        print("❌ Ошибка при преобразовании данных:", str(error))
+        raise SystemExit(1)